@@ -18,6 +18,22 @@ from utils import (
     get_entity_name_by_id
 )
 from data_management import display_import_export_page
+from stats import (
+    ensure_summary_tables,
+    count_entities,
+    count_relationships,
+    count_tags,
+    display_stats_page
+)
+from change_log import ensure_change_log, prune_change_log
+from recommender import get_related_entities
+from centrality import has_entity_scores
+from planner import display_learning_path_page
+from federation import parse_db_paths, display_federation_page
+from facets import get_facet_index, get_facet_counts, format_counts_caption
+from stats import get_relationship_type_counts, get_tag_counts
+from dedup import display_duplicates_page
+from tracing import start_trace, finish_trace, span, export_chrome_trace, summarize_trace
 
 # Page configuration
 st.set_page_config(
@@ -43,313 +59,475 @@ def validate_db_path(path):
         st.error(f"Could not connect to database at {path}. Error: {str(e)}")
         return False
 
-# Add database path configuration
-db_path = st.sidebar.text_input("Database Path", value="math.db")
+# Trace where this rerun spends its time; the trace is always finished, also when
+# the rerun is interrupted by st.rerun() or st.stop()
+rerun_trace = start_trace("rerun")
+try:
+    # Add database path configuration
+    db_path = st.sidebar.text_input("Database Path", value="math.db")
 
-# Validate database
-db_valid = validate_db_path(db_path)
+    # Validate database
+    db_valid = validate_db_path(db_path)
 
-# Create sidebar navigation
-st.sidebar.title("Navigation")
-page = st.sidebar.radio(
-    "Select Page",
-    ["Browse Entities", "Import/Export Data"]
-)
+    # Make sure the precomputed statistics tables exist
+    summary_available = False
+    if db_valid:
+        try:
+            ensure_summary_tables(db_path)
+            summary_available = True
+        except Exception as e:
+            st.sidebar.warning(f"Summary statistics unavailable: {str(e)}")
+
+    # Record row changes; once per session, drop log entries no subscriber still needs
+    if db_valid:
+        try:
+            ensure_change_log(db_path)
+            if st.session_state.get("change_log_pruned") != db_path:
+                prune_change_log(db_path=db_path)
+                st.session_state["change_log_pruned"] = db_path
+        except Exception as e:
+            st.sidebar.warning(f"Change tracking unavailable: {str(e)}")
+
+    # Create sidebar navigation
+    st.sidebar.title("Navigation")
+    page = st.sidebar.radio(
+        "Select Page",
+        ["Browse Entities", "Statistics", "Learning Path", "Duplicate Review", "Federation", "Import/Export Data"]
+    )
+
+    # Databases queried together on the Federation page
+    if page == "Federation":
+        federated_paths = parse_db_paths(st.sidebar.text_area(
+            "Federated Databases (one path per line)",
+            value=db_path,
+            key="federated_paths"
+        ))
+
+    # Title banner
+    st.title("Math Database Explorer 📚")
 
-# Title banner
-st.title("Math Database Explorer 📚")
+    # Different pages based on selection
+    if page == "Federation":
+        with span("Federation page"):
+            display_federation_page(federated_paths)
 
-# Different pages based on selection
-if db_valid:
-    if page == "Browse Entities":
-        # Original Browse Entities functionality
-        st.markdown("""
-        This application allows you to explore the mathematics database, view concepts, 
-        theorems, proofs, and the relationships between different mathematical entities.
-        """)
+    elif db_valid:
+        if page == "Browse Entities":
+            # Original Browse Entities functionality
+            st.markdown("""
+            This application allows you to explore the mathematics database, view concepts, 
+            theorems, proofs, and the relationships between different mathematical entities.
+            """)
         
-        # Create tabs for different tables
-        table_tabs = st.tabs(["Math Entities", "Relationships", "Tags"])
+            # In-memory bitmap index used for the option counts in the filters
+            try:
+                facet_index = get_facet_index(db_path)
+            except Exception as e:
+                facet_index = None
+                st.warning(f"Filter counts unavailable: {str(e)}")
+        
+            # Create tabs for different tables
+            table_tabs = st.tabs(["Math Entities", "Relationships", "Tags"])
         
-        # Math Entities Tab
-        with table_tabs[0]:
-            st.header("Mathematical Entities")
+            # Math Entities Tab
+            with table_tabs[0], span("Math Entities tab"):
+                st.header("Mathematical Entities")
             
-            # Filters in columns for better layout
-            col1, col2 = st.columns(2)
+                # Live option counts from the facet index, using the current selections. The
+                # name and parent filters are not indexed, so counts are hidden while they are set.
+                type_counts, course_counts = {}, {}
+                unindexed_selections = [st.session_state.get("entity_name"), st.session_state.get("entity_parent")]
+                if facet_index is not None and all(value in (None, "", "All") for value in unindexed_selections):
+                    current_selections = {
+                        'type': st.session_state.get("entity_type"),
+                        'course': st.session_state.get("entity_course")
+                    }
+                    type_counts = get_facet_counts(facet_index, 'type', current_selections)
+                    course_counts = get_facet_counts(facet_index, 'course', current_selections)
             
-            with col1:
-                type_filter = st.selectbox(
-                    "Filter by Type",
-                    options=get_type_options(db_path),
-                    key="entity_type"
-                )
+                # Filters in columns for better layout
+                col1, col2 = st.columns(2)
+            
+                with col1:
+                    type_filter = st.selectbox(
+                        "Filter by Type",
+                        options=get_type_options(db_path),
+                        key="entity_type"
+                    )
+                    if type_counts:
+                        st.caption(format_counts_caption(type_counts))
                 
-                # Use db_path explicitly in all filter options
-                name_filter = st.selectbox(
-                    "Filter by Name",
-                    options=get_name_options(db_path),
-                    key="entity_name"
-                )
+                    # Use db_path explicitly in all filter options
+                    name_filter = st.selectbox(
+                        "Filter by Name",
+                        options=get_name_options(db_path),
+                        key="entity_name"
+                    )
             
-            with col2:
-                course_filter = st.selectbox(
-                    "Filter by Course",
-                    options=get_course_options(db_path),
-                    key="entity_course"
-                )
+                with col2:
+                    course_filter = st.selectbox(
+                        "Filter by Course",
+                        options=get_course_options(db_path),
+                        key="entity_course"
+                    )
+                    if course_counts:
+                        st.caption(format_counts_caption(course_counts))
                 
-                parent_filter = st.selectbox(
-                    "Filter by Parent",
-                    options=get_parent_options(db_path),
-                    key="entity_parent"
-                )
+                    parent_filter = st.selectbox(
+                        "Filter by Parent",
+                        options=get_parent_options(db_path),
+                        key="entity_parent"
+                    )
             
-            # Process parent_id if it's a numeric option
-            if parent_filter and ":" in parent_filter:
-                parent_id = parent_filter.split(":")[0].strip()
-            else:
-                parent_id = parent_filter
+                # Offer importance ordering once centrality scores have been computed
+                order_by_importance = False
+                if has_entity_scores(db_path):
+                    sort_order = st.radio(
+                        "Sort by",
+                        options=["ID", "Importance"],
+                        horizontal=True,
+                        key="entity_sort"
+                    )
+                    order_by_importance = sort_order == "Importance"
             
-            # Process name filter - make sure we pass db_path to get entity name
-            if name_filter == "All":
-                name_filter = None
+                # Process parent_id if it's a numeric option
+                if parent_filter and ":" in parent_filter:
+                    parent_id = parent_filter.split(":")[0].strip()
+                else:
+                    parent_id = parent_filter
             
-            # Build and execute query
-            query = get_filtered_entities_query(
-                type_value=type_filter,
-                course_value=course_filter,
-                name_value=name_filter,
-                parent_value=parent_id
-            )
+                # Process name filter - make sure we pass db_path to get entity name
+                if name_filter == "All":
+                    name_filter = None
             
-            try:
-                entities_df = execute_query(query, db_path=db_path)
+                # Build and execute query
+                query = get_filtered_entities_query(
+                    type_value=type_filter,
+                    course_value=course_filter,
+                    name_value=name_filter,
+                    parent_value=parent_id,
+                    order_by_importance=order_by_importance
+                )
+            
+                try:
+                    # Read the result count from the summary table when only type/course filters
+                    # apply, before any row is loaded; an empty result then loads nothing
+                    result_count = None
+                    if not name_filter and parent_id in (None, "", "All") and summary_available:
+                        result_count = count_entities(type_filter, course_filter, db_path)
+                        if result_count:
+                            st.write(f"Found {result_count} entities matching your criteria.")
+                
+                    entities_df = execute_query(query, db_path=db_path) if result_count != 0 else pd.DataFrame()
                 
-                # Display the data
-                if not entities_df.empty:
-                    # Format for display
-                    display_df = format_dataframe_for_display(entities_df, 'math_entities', db_path)
+                    # Display the data
+                    if not entities_df.empty:
+                        # Format for display
+                        display_df = format_dataframe_for_display(entities_df, 'math_entities', db_path)
                     
-                    # Show result count
-                    st.write(f"Found {len(entities_df)} entities matching your criteria.")
+                        # Show result count
+                        if result_count is None:
+                            st.write(f"Found {len(entities_df)} entities matching your criteria.")
                     
-                    # Display the table
-                    st.dataframe(display_df, use_container_width=True)
+                        # Display the table
+                        with span("render entities table"):
+                            st.dataframe(display_df, use_container_width=True)
                     
-                    # Detail view for selected entity
-                    if st.checkbox("Show detailed view of selected entity", value=True):
-                        # Search entities by name for a more user-friendly experience
-                        entity_search = st.text_input("Search entity by name:", key="entity_detail_search")
-                        if entity_search:
-                            entity_search_query = f"SELECT id, name FROM math_entities WHERE name LIKE '%{entity_search}%' ORDER BY name LIMIT 10"
-                            entity_search_results = execute_query(entity_search_query, db_path=db_path)
-                            if not entity_search_results.empty:
-                                entity_options = [f"{row['id']}: {row['name']}" for _, row in entity_search_results.iterrows()]
-                                selected_entity = st.selectbox("Select entity:", options=entity_options, key="entity_select")
-                                if selected_entity:
-                                    entity_id = int(selected_entity.split(":")[0].strip())
-                                    # Continue with existing code for showing details
+                        # Detail view for selected entity
+                        if st.checkbox("Show detailed view of selected entity", value=True):
+                            # Search entities by name for a more user-friendly experience
+                            entity_search = st.text_input("Search entity by name:", key="entity_detail_search")
+                            if entity_search:
+                                entity_search_query = f"SELECT id, name FROM math_entities WHERE name LIKE '%{entity_search}%' ORDER BY name LIMIT 10"
+                                entity_search_results = execute_query(entity_search_query, db_path=db_path)
+                                if not entity_search_results.empty:
+                                    entity_options = [f"{row['id']}: {row['name']}" for _, row in entity_search_results.iterrows()]
+                                    selected_entity = st.selectbox("Select entity:", options=entity_options, key="entity_select")
+                                    if selected_entity:
+                                        entity_id = int(selected_entity.split(":")[0].strip())
+                                        # Continue with existing code for showing details
+                                else:
+                                    st.warning(f"No entities found matching '{entity_search}'")
+                                    entity_id = None
                             else:
-                                st.warning(f"No entities found matching '{entity_search}'")
                                 entity_id = None
-                        else:
-                            entity_id = None
                         
-                        # Still provide a direct ID input option for advanced users
-                        if not entity_id:
-                            show_id_input = st.checkbox("Or enter entity ID directly", value=False)
-                            if show_id_input:
-                                entity_id = st.number_input("Enter entity ID", min_value=1, step=1)
+                            # Still provide a direct ID input option for advanced users
+                            if not entity_id:
+                                show_id_input = st.checkbox("Or enter entity ID directly", value=False)
+                                if show_id_input:
+                                    entity_id = st.number_input("Enter entity ID", min_value=1, step=1)
                         
-                        if entity_id:
-                            detailed_query = f"SELECT * FROM math_entities WHERE id = {entity_id}"
-                            entity_detail = execute_query(detailed_query, db_path=db_path)
+                            if entity_id:
+                                detailed_query = f"SELECT * FROM math_entities WHERE id = {entity_id}"
+                                entity_detail = execute_query(detailed_query, db_path=db_path)
                             
-                            if not entity_detail.empty:
-                                st.subheader(f"Details for: {entity_detail['name'].iloc[0]}")
+                                if not entity_detail.empty:
+                                    st.subheader(f"Details for: {entity_detail['name'].iloc[0]}")
                                 
-                                # Display entity details
-                                col1, col2 = st.columns(2)
+                                    # Display entity details
+                                    col1, col2 = st.columns(2)
                                 
-                                with col1:
-                                    st.markdown("**Basic Information**")
-                                    st.write(f"**ID:** {entity_detail['id'].iloc[0]}")
-                                    st.write(f"**Name:** {entity_detail['name'].iloc[0]}")
-                                    st.write(f"**Type:** {entity_detail['type'].iloc[0]}")
-                                    st.write(f"**Course:** {entity_detail['course'].iloc[0]}")
+                                    with col1:
+                                        st.markdown("**Basic Information**")
+                                        st.write(f"**ID:** {entity_detail['id'].iloc[0]}")
+                                        st.write(f"**Name:** {entity_detail['name'].iloc[0]}")
+                                        st.write(f"**Type:** {entity_detail['type'].iloc[0]}")
+                                        st.write(f"**Course:** {entity_detail['course'].iloc[0]}")
                                     
-                                    # Handle parent relationship
-                                    parent_id = entity_detail['parent_id'].iloc[0]
-                                    if pd.notna(parent_id):
-                                        parent_name = get_entity_name_by_id(parent_id, db_path)
-                                        st.write(f"**Parent:** {parent_name} (ID: {parent_id})")
+                                        # Handle parent relationship
+                                        parent_id = entity_detail['parent_id'].iloc[0]
+                                        if pd.notna(parent_id):
+                                            parent_name = get_entity_name_by_id(parent_id, db_path)
+                                            st.write(f"**Parent:** {parent_name} (ID: {parent_id})")
                                     
-                                    if 'sequence_num' in entity_detail.columns and pd.notna(entity_detail['sequence_num'].iloc[0]):
-                                        st.write(f"**Sequence Number:** {entity_detail['sequence_num'].iloc[0]}")
+                                        if 'sequence_num' in entity_detail.columns and pd.notna(entity_detail['sequence_num'].iloc[0]):
+                                            st.write(f"**Sequence Number:** {entity_detail['sequence_num'].iloc[0]}")
                                 
-                                with col2:
-                                    st.markdown("**Content**")
-                                    if 'description' in entity_detail.columns and pd.notna(entity_detail['description'].iloc[0]):
-                                        st.markdown("**Description:**")
-                                        st.write(entity_detail['description'].iloc[0])
+                                    with col2:
+                                        st.markdown("**Content**")
+                                        if 'description' in entity_detail.columns and pd.notna(entity_detail['description'].iloc[0]):
+                                            st.markdown("**Description:**")
+                                            st.write(entity_detail['description'].iloc[0])
                                     
-                                    if 'latex_content' in entity_detail.columns and pd.notna(entity_detail['latex_content'].iloc[0]):
-                                        st.markdown("**LaTeX Content:**")
-                                        st.markdown(entity_detail['latex_content'].iloc[0])
+                                        if 'latex_content' in entity_detail.columns and pd.notna(entity_detail['latex_content'].iloc[0]):
+                                            st.markdown("**LaTeX Content:**")
+                                            with span("render LaTeX"):
+                                                st.markdown(entity_detail['latex_content'].iloc[0])
                                 
-                                # Show related entities
-                                st.markdown("**Related Entities**")
+                                    # Show related entities
+                                    st.markdown("**Related Entities**")
                                 
-                                # Find relationships where this entity is the subject
-                                subject_query = f"""
-                                SELECT r.relationship, m.name, m.type, r.description
-                                FROM relationships r
-                                JOIN math_entities m ON r.object_id = m.id
-                                WHERE r.subject_id = {entity_id}
-                                """
-                                subject_relations = execute_query(subject_query, db_path=db_path)
+                                    # Find relationships where this entity is the subject
+                                    subject_query = f"""
+                                    SELECT r.relationship, m.name, m.type, r.description
+                                    FROM relationships r
+                                    JOIN math_entities m ON r.object_id = m.id
+                                    WHERE r.subject_id = {entity_id}
+                                    """
+                                    subject_relations = execute_query(subject_query, db_path=db_path)
                                 
-                                if not subject_relations.empty:
-                                    st.markdown("**Outgoing Relationships:**")
-                                    # Format for display - focus on the relationship and related entity
-                                    formatted_relations = subject_relations.rename(columns={
-                                        'name': 'Related Entity',
-                                        'type': 'Entity Type',
-                                        'relationship': 'Relationship',
-                                        'description': 'Description'
-                                    })
-                                    st.dataframe(formatted_relations, use_container_width=True)
+                                    if not subject_relations.empty:
+                                        st.markdown("**Outgoing Relationships:**")
+                                        # Format for display - focus on the relationship and related entity
+                                        formatted_relations = subject_relations.rename(columns={
+                                            'name': 'Related Entity',
+                                            'type': 'Entity Type',
+                                            'relationship': 'Relationship',
+                                            'description': 'Description'
+                                        })
+                                        st.dataframe(formatted_relations, use_container_width=True)
                                 
-                                # Find relationships where this entity is the object
-                                object_query = f"""
-                                SELECT r.relationship, m.name, m.type, r.description
-                                FROM relationships r
-                                JOIN math_entities m ON r.subject_id = m.id
-                                WHERE r.object_id = {entity_id}
-                                """
-                                object_relations = execute_query(object_query, db_path=db_path)
+                                    # Find relationships where this entity is the object
+                                    object_query = f"""
+                                    SELECT r.relationship, m.name, m.type, r.description
+                                    FROM relationships r
+                                    JOIN math_entities m ON r.subject_id = m.id
+                                    WHERE r.object_id = {entity_id}
+                                    """
+                                    object_relations = execute_query(object_query, db_path=db_path)
                                 
-                                if not object_relations.empty:
-                                    st.markdown("**Incoming Relationships:**")
-                                    # Format for display - focus on the relationship and related entity
-                                    formatted_relations = object_relations.rename(columns={
-                                        'name': 'Related Entity',
-                                        'type': 'Entity Type',
-                                        'relationship': 'Relationship',
-                                        'description': 'Description'
-                                    })
-                                    st.dataframe(formatted_relations, use_container_width=True)
+                                    if not object_relations.empty:
+                                        st.markdown("**Incoming Relationships:**")
+                                        # Format for display - focus on the relationship and related entity
+                                        formatted_relations = object_relations.rename(columns={
+                                            'name': 'Related Entity',
+                                            'type': 'Entity Type',
+                                            'relationship': 'Relationship',
+                                            'description': 'Description'
+                                        })
+                                        st.dataframe(formatted_relations, use_container_width=True)
                                 
-                                # Find tags for this entity
-                                tags_query = f"SELECT tag FROM tags WHERE entity_id = {entity_id}"
-                                tags = execute_query(tags_query, db_path=db_path)
+                                    # Find tags for this entity
+                                    tags_query = f"SELECT tag FROM tags WHERE entity_id = {entity_id}"
+                                    tags = execute_query(tags_query, db_path=db_path)
                                 
-                                if not tags.empty:
-                                    st.markdown("**Tags:**")
-                                    st.write(", ".join(tags['tag'].tolist()))
-                            else:
-                                st.warning(f"No entity found with ID {entity_id}")
-                else:
-                    st.info("No entities found with the current filters.")
-            except Exception as e:
-                st.error(f"Error querying the database: {str(e)}")
+                                    if not tags.empty:
+                                        st.markdown("**Tags:**")
+                                        st.write(", ".join(tags['tag'].tolist()))
+                                
+                                    # Show precomputed similar entities
+                                    related = get_related_entities(entity_id, db_path)
+                                    if not related.empty:
+                                        st.markdown("**Similar Entities:**")
+                                        st.dataframe(related.rename(columns={
+                                            'id': 'ID',
+                                            'name': 'Similar Entity',
+                                            'type': 'Entity Type',
+                                            'similarity': 'Similarity'
+                                        }), use_container_width=True)
+                                else:
+                                    st.warning(f"No entity found with ID {entity_id}")
+                    else:
+                        st.info("No entities found with the current filters.")
+                except Exception as e:
+                    st.error(f"Error querying the database: {str(e)}")
         
-        # Relationships Tab
-        with table_tabs[1]:
-            st.header("Relationships Between Entities")
+            # Relationships Tab
+            with table_tabs[1], span("Relationships tab"):
+                st.header("Relationships Between Entities")
             
-            # Filters in columns
-            col1, col2 = st.columns(2)
+                # Filters in columns
+                col1, col2 = st.columns(2)
             
-            with col1:
-                relationship_filter = st.selectbox(
-                    "Filter by Relationship Type",
-                    options=get_relationship_options(db_path),
-                    key="rel_type"
-                )
+                with col1:
+                    # Option counts from the summary table, hidden while subject/object filters apply
+                    relationship_counts = {}
+                    if (summary_available and not st.session_state.get("subject_id")
+                            and not st.session_state.get("object_id")):
+                        counts_df = get_relationship_type_counts(db_path)
+                        relationship_counts = dict(zip(counts_df['relationship'], counts_df['count']))
+                        relationship_counts["All"] = int(counts_df['count'].sum())
+                    relationship_filter = st.selectbox(
+                        "Filter by Relationship Type",
+                        options=get_relationship_options(db_path),
+                        key="rel_type"
+                    )
+                    if relationship_counts:
+                        st.caption(format_counts_caption(relationship_counts))
             
-            with col2:
-                subject_filter = st.text_input(
-                    "Filter by Subject (name or ID)",
-                    key="subject_id"
-                )
+                with col2:
+                    subject_filter = st.text_input(
+                        "Filter by Subject (name or ID)",
+                        key="subject_id"
+                    )
                 
-                object_filter = st.text_input(
-                    "Filter by Object (name or ID)",
-                    key="object_id"
-                )
+                    object_filter = st.text_input(
+                        "Filter by Object (name or ID)",
+                        key="object_id"
+                    )
             
-            # Build and execute query
-            query = get_filtered_relationships_query(
-                relationship_value=relationship_filter,
-                subject_value=subject_filter,
-                object_value=object_filter
-            )
+                # Build and execute query
+                query = get_filtered_relationships_query(
+                    relationship_value=relationship_filter,
+                    subject_value=subject_filter,
+                    object_value=object_filter
+                )
             
-            try:
-                relationships_df = execute_query(query, db_path=db_path)
+                try:
+                    # Read the result count from the summary table when only the type filter
+                    # applies, before any row is loaded; an empty result then loads nothing
+                    result_count = None
+                    if not subject_filter and not object_filter and summary_available:
+                        result_count = count_relationships(relationship_filter, db_path)
+                        if result_count:
+                            st.write(f"Found {result_count} relationships matching your criteria.")
+                
+                    relationships_df = execute_query(query, db_path=db_path) if result_count != 0 else pd.DataFrame()
                 
-                # Display the data
-                if not relationships_df.empty:
-                    # Show result count
-                    st.write(f"Found {len(relationships_df)} relationships matching your criteria.")
+                    # Display the data
+                    if not relationships_df.empty:
+                        # Show result count
+                        if result_count is None:
+                            st.write(f"Found {len(relationships_df)} relationships matching your criteria.")
                     
-                    # Display the table
-                    st.dataframe(relationships_df, use_container_width=True)
-                else:
-                    st.info("No relationships found with the current filters.")
-            except Exception as e:
-                st.error(f"Error querying the database: {str(e)}")
+                        # Display the table
+                        with span("render relationships table"):
+                            st.dataframe(relationships_df, use_container_width=True)
+                    else:
+                        st.info("No relationships found with the current filters.")
+                except Exception as e:
+                    st.error(f"Error querying the database: {str(e)}")
         
-        # Tags Tab
-        with table_tabs[2]:
-            st.header("Entity Tags")
+            # Tags Tab
+            with table_tabs[2], span("Tags tab"):
+                st.header("Entity Tags")
             
-            # Filters
-            col1, col2 = st.columns(2)
+                # Filters
+                col1, col2 = st.columns(2)
             
-            with col1:
-                tag_filter = st.selectbox(
-                    "Filter by Tag",
-                    options=get_tag_options(db_path),
-                    key="tag_value"
-                )
+                with col1:
+                    # Option counts of tag rows from the summary table, hidden while the entity filter applies
+                    tag_counts = {}
+                    if summary_available and not st.session_state.get("tag_entity_id"):
+                        counts_df = get_tag_counts(db_path)
+                        tag_counts = dict(zip(counts_df['tag'], counts_df['count']))
+                        tag_counts["All"] = int(counts_df['count'].sum())
+                    tag_filter = st.selectbox(
+                        "Filter by Tag",
+                        options=get_tag_options(db_path),
+                        key="tag_value"
+                    )
+                    if tag_counts:
+                        st.caption(format_counts_caption(tag_counts))
             
-            with col2:
-                entity_filter = st.text_input(
-                    "Filter by Entity (name or ID)",
-                    key="tag_entity_id"
-                )
+                with col2:
+                    entity_filter = st.text_input(
+                        "Filter by Entity (name or ID)",
+                        key="tag_entity_id"
+                    )
             
-            # Build and execute query
-            query = get_filtered_tags_query(
-                tag_value=tag_filter,
-                entity_value=entity_filter
-            )
+                # Build and execute query
+                query = get_filtered_tags_query(
+                    tag_value=tag_filter,
+                    entity_value=entity_filter
+                )
             
-            try:
-                tags_df = execute_query(query, db_path=db_path)
+                try:
+                    # Read the result count from the summary table when only the tag filter
+                    # applies, before any row is loaded; an empty result then loads nothing
+                    result_count = None
+                    if not entity_filter and summary_available:
+                        result_count = count_tags(tag_filter, db_path)
+                        if result_count:
+                            st.write(f"Found {result_count} tags matching your criteria.")
                 
-                # Display the data
-                if not tags_df.empty:
-                    # Show result count
-                    st.write(f"Found {len(tags_df)} tags matching your criteria.")
+                    tags_df = execute_query(query, db_path=db_path) if result_count != 0 else pd.DataFrame()
+                
+                    # Display the data
+                    if not tags_df.empty:
+                        # Show result count
+                        if result_count is None:
+                            st.write(f"Found {len(tags_df)} tags matching your criteria.")
                     
-                    # Display the table
-                    st.dataframe(tags_df, use_container_width=True)
-                else:
-                    st.info("No tags found with the current filters.")
-            except Exception as e:
-                st.error(f"Error querying the database: {str(e)}")
+                        # Display the table
+                        with span("render tags table"):
+                            st.dataframe(tags_df, use_container_width=True)
+                    else:
+                        st.info("No tags found with the current filters.")
+                except Exception as e:
+                    st.error(f"Error querying the database: {str(e)}")
     
-    elif page == "Import/Export Data":
-        display_import_export_page(db_path)
+        elif page == "Statistics":
+            if summary_available:
+                with span("Statistics page"):
+                    display_stats_page(db_path)
+            else:
+                st.warning("Statistics are unavailable for this database.")
+
+        elif page == "Learning Path":
+            with span("Learning Path page"):
+                display_learning_path_page(db_path)
+
+        elif page == "Duplicate Review":
+            with span("Duplicate Review page"):
+                display_duplicates_page(db_path)
+
+        elif page == "Import/Export Data":
+            with span("Import/Export page"):
+                display_import_export_page(db_path)
+
+    else:
+        st.error("Please provide a valid database path in the sidebar.")
+        st.info("The application needs a valid SQLite database with the required tables: math_entities, relationships, and tags.")
 
-else:
-    st.error("Please provide a valid database path in the sidebar.")
-    st.info("The application needs a valid SQLite database with the required tables: math_entities, relationships, and tags.")
+    # Footer
+    st.markdown("---")
+    st.markdown("Math Database Explorer | Created with Streamlit")
+finally:
+    finish_trace(rerun_trace)
 
-# Footer
-st.markdown("---")
-st.markdown("Math Database Explorer | Created with Streamlit")
+# Performance panel for this rerun
+if st.sidebar.checkbox("Show performance trace", value=False):
+    with st.sidebar.expander("Rerun trace", expanded=True):
+        total_ms = (rerun_trace['end_us'] - rerun_trace['start_us']) / 1000
+        st.write(f"Rerun took {total_ms:.1f} ms ({len(rerun_trace['events'])} spans)")
+        st.dataframe(summarize_trace(rerun_trace), use_container_width=True, hide_index=True)
+        st.download_button(
+            "Download Chrome trace",
+            data=export_chrome_trace(rerun_trace),
+            file_name="rerun_trace.json",
+            mime="application/json"
+        )
+        if rerun_trace['profile']:
+            st.text(rerun_trace['profile'])
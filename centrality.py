@@ -0,0 +1,188 @@
+import argparse
+import numpy as np
+from scipy import sparse
+from database import get_connection, get_all_tables
+
+ENTITY_SCORES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS entity_scores (
+    entity_id INTEGER PRIMARY KEY,
+    pagerank REAL NOT NULL,
+    in_degree INTEGER NOT NULL,
+    out_degree INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entity_scores_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+def _fetch_int_columns(conn, table, columns, where="", params=(), chunk_rows=500000):
+    """
+    Read integer columns of a table into an (n, len(columns)) int64 array
+
+    Rows are aggregated into one comma-separated string per rowid range inside
+    SQLite and parsed by NumPy, which avoids creating a Python tuple per row. Rows
+    with a NULL in any of the columns are skipped.
+    """
+    low, high = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+    if low is None:
+        return np.zeros((0, len(columns)), dtype=np.int64)
+    expression = " || ',' || ".join(columns)
+    condition = f" AND ({where})" if where else ""
+    query = f"SELECT group_concat({expression}) FROM {table} WHERE rowid BETWEEN ? AND ?{condition}"
+    parts = []
+    for chunk_start in range(low, high + 1, chunk_rows):
+        text = conn.execute(query, [chunk_start, chunk_start + chunk_rows - 1, *params]).fetchone()[0]
+        if text:
+            parts.append(np.fromstring(text, dtype=np.int64, sep=','))
+    if not parts:
+        return np.zeros((0, len(columns)), dtype=np.int64)
+    return np.concatenate(parts).reshape(-1, len(columns))
+
+def load_graph(db_path='math.db', relationship_types=None, chunk_rows=500000):
+    """
+    Load entity ids and relationship edges into NumPy arrays
+
+    Args:
+        db_path: Path to the database
+        relationship_types: Optional list of relationship types to include
+        chunk_rows: Number of rowids read from SQLite at a time
+
+    Returns:
+        Tuple (entity_ids, sources, targets) where sources/targets are row indices
+        into the sorted entity_ids array; edges to unknown entities are dropped
+    """
+    conn = get_connection(db_path)
+    try:
+        entity_ids = np.sort(_fetch_int_columns(conn, "math_entities", ["id"], chunk_rows=chunk_rows).ravel())
+        where, params = "", ()
+        if relationship_types:
+            where = f"relationship IN ({', '.join('?' for _ in relationship_types)})"
+            params = tuple(relationship_types)
+        edges = _fetch_int_columns(
+            conn, "relationships", ["subject_id", "object_id"], where, params, chunk_rows
+        )
+    finally:
+        conn.close()
+
+    sources = np.searchsorted(entity_ids, edges[:, 0])
+    targets = np.searchsorted(entity_ids, edges[:, 1])
+    n = len(entity_ids)
+    valid = (sources < n) & (targets < n)
+    valid[valid] &= (entity_ids[sources[valid]] == edges[valid, 0]) & (entity_ids[targets[valid]] == edges[valid, 1])
+    return entity_ids, sources[valid], targets[valid]
+
+def compute_pagerank(sources, targets, n, damping=0.85, tol=1e-6, max_iter=100):
+    """
+    Compute PageRank with vectorised sparse power iteration
+
+    Rank flows from the subject of a relationship to its object. Mass of entities
+    without outgoing edges is redistributed uniformly.
+
+    Args:
+        sources: Row indices of edge subjects
+        targets: Row indices of edge objects
+        n: Number of entities
+        damping: Damping factor
+        tol: L1 convergence tolerance
+        max_iter: Maximum number of iterations
+
+    Returns:
+        Array of PageRank scores summing to 1
+    """
+    if n == 0:
+        return np.zeros(0)
+    out_degree = np.bincount(sources, minlength=n).astype(np.float64)
+    weights = 1.0 / out_degree[sources]
+    # transition[i, j] is the probability of moving from j to i
+    transition = sparse.csr_matrix((weights, (targets, sources)), shape=(n, n))
+    dangling = out_degree == 0
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        new_rank = damping * transition.dot(rank)
+        new_rank += (damping * rank[dangling].sum() + 1.0 - damping) / n
+        converged = np.abs(new_rank - rank).sum() < tol
+        rank = new_rank
+        if converged:
+            break
+    return rank
+
+def compute_entity_scores(db_path='math.db', relationship_types=None, damping=0.85):
+    """
+    Compute PageRank and in/out degree for every entity
+
+    Returns:
+        Tuple (entity_ids, pagerank, in_degree, out_degree) of NumPy arrays
+    """
+    entity_ids, sources, targets = load_graph(db_path, relationship_types)
+    n = len(entity_ids)
+    pagerank = compute_pagerank(sources, targets, n, damping)
+    in_degree = np.bincount(targets, minlength=n)
+    out_degree = np.bincount(sources, minlength=n)
+    return entity_ids, pagerank, in_degree, out_degree
+
+def build_entity_scores(db_path='math.db', relationship_types=None, damping=0.85):
+    """
+    Recompute the entity_scores table
+
+    Returns:
+        Number of entities scored
+    """
+    entity_ids, pagerank, in_degree, out_degree = compute_entity_scores(
+        db_path, relationship_types, damping
+    )
+    conn = get_connection(db_path)
+    try:
+        conn.executescript(ENTITY_SCORES_TABLE_SQL)
+        conn.execute("DELETE FROM entity_scores")
+        conn.executemany(
+            "INSERT INTO entity_scores (entity_id, pagerank, in_degree, out_degree) VALUES (?, ?, ?, ?)",
+            zip(entity_ids.tolist(), pagerank.tolist(), in_degree.tolist(), out_degree.tolist())
+        )
+        # Build stamp, so that caches of ranked results notice a rebuild
+        conn.execute("""
+            INSERT INTO entity_scores_state (key, value) VALUES ('build', 1)
+            ON CONFLICT (key) DO UPDATE SET value = value + 1
+        """)
+        conn.commit()
+    finally:
+        conn.close()
+    return len(entity_ids)
+
+def has_entity_scores(db_path='math.db'):
+    """Check whether the entity_scores table has been built"""
+    return 'entity_scores' in get_all_tables(db_path)
+
+def get_entity_scores_version(db_path='math.db'):
+    """
+    Get a stamp that changes with every build of entity_scores
+
+    Returns:
+        None when the table has not been built, otherwise the build number
+        (0 for a table built before builds were numbered)
+    """
+    conn = get_connection(db_path)
+    try:
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name IN ('entity_scores', 'entity_scores_state')"
+        )}
+        if 'entity_scores' not in tables:
+            return None
+        row = None
+        if 'entity_scores_state' in tables:
+            row = conn.execute("SELECT value FROM entity_scores_state WHERE key = 'build'").fetchone()
+    finally:
+        conn.close()
+    return int(row[0]) if row else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute entity centrality scores")
+    parser.add_argument("--db", default="math.db", help="Path to the database")
+    parser.add_argument("--damping", type=float, default=0.85, help="PageRank damping factor")
+    parser.add_argument("--relationship", action="append", dest="relationships",
+                        help="Relationship type to include (repeatable, default all)")
+    args = parser.parse_args()
+
+    count = build_entity_scores(args.db, args.relationships, args.damping)
+    print(f"Computed scores for {count} entities")
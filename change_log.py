@@ -0,0 +1,198 @@
+import argparse
+from database import get_connection, execute_query, execute_write, execute_script_write
+
+# Tables whose row changes are recorded in the change log
+TRACKED_TABLES = ['math_entities', 'relationships', 'tags']
+
+CHANGE_LOG_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS change_log (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    operation TEXT NOT NULL,
+    changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_change_log_table ON change_log (table_name, version);
+CREATE TABLE IF NOT EXISTS change_log_subscribers (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+CHANGE_LOG_TRIGGERS_TEMPLATE = """
+CREATE TRIGGER IF NOT EXISTS change_log_{table}_insert AFTER INSERT ON {table}
+BEGIN
+    INSERT INTO change_log (table_name, row_id, operation) VALUES ('{table}', NEW.id, 'INSERT');
+END;
+
+CREATE TRIGGER IF NOT EXISTS change_log_{table}_update AFTER UPDATE ON {table}
+BEGIN
+    INSERT INTO change_log (table_name, row_id, operation)
+    SELECT '{table}', OLD.id, 'DELETE' WHERE OLD.id IS NOT NEW.id;
+    INSERT INTO change_log (table_name, row_id, operation)
+    VALUES ('{table}', NEW.id, CASE WHEN OLD.id IS NOT NEW.id THEN 'INSERT' ELSE 'UPDATE' END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS change_log_{table}_delete AFTER DELETE ON {table}
+BEGIN
+    INSERT INTO change_log (table_name, row_id, operation) VALUES ('{table}', OLD.id, 'DELETE');
+END;
+"""
+
+def ensure_change_log(db_path='math.db'):
+    """Create the change log table and its triggers if they do not exist yet"""
+    triggers = "".join(
+        CHANGE_LOG_TRIGGERS_TEMPLATE.format(table=table) for table in TRACKED_TABLES
+    )
+    conn = get_connection(db_path)
+    try:
+        installed = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name LIKE 'change_log_%'"
+        ).fetchone()[0]
+        has_subscribers = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='change_log_subscribers'"
+        ).fetchone()
+    finally:
+        conn.close()
+    if installed == 3 * len(TRACKED_TABLES) and has_subscribers:
+        return
+    execute_script_write(CHANGE_LOG_TABLE_SQL + triggers, db_path)
+
+def get_data_version(db_path='math.db'):
+    """
+    Get the current data version of the database
+
+    The version is the last change log sequence number. It only ever increases,
+    even after the change log has been pruned, so it can be used as a cache key.
+    """
+    conn = get_connection(db_path)
+    try:
+        row = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+        ).fetchone()
+    except Exception:
+        row = None
+    finally:
+        conn.close()
+    return int(row[0]) if row else 0
+
+def get_changes_since(version, tables=None, db_path='math.db'):
+    """
+    Get all recorded changes newer than a version
+
+    Args:
+        version: Only changes with a greater version are returned
+        tables: Optional list of table names to restrict the result to
+        db_path: Path to the database
+
+    Returns:
+        DataFrame with version, table_name, row_id, operation and changed_at columns
+    """
+    query = "SELECT version, table_name, row_id, operation, changed_at FROM change_log WHERE version > ?"
+    params = [int(version)]
+    if tables:
+        query += f" AND table_name IN ({', '.join('?' for _ in tables)})"
+        params.extend(tables)
+    query += " ORDER BY version"
+    return execute_query(query, params=params, db_path=db_path)
+
+def get_changed_row_ids(version, table, db_path='math.db'):
+    """
+    Get the ids of rows in a table touched since a version
+
+    Returns:
+        Tuple (upserted_ids, deleted_ids) holding the final state of each touched row
+    """
+    changes = get_changes_since(version, tables=[table], db_path=db_path)
+    upserted, deleted = set(), set()
+    for row_id, operation in zip(changes['row_id'], changes['operation']):
+        row_id = int(row_id)
+        if operation == 'DELETE':
+            upserted.discard(row_id)
+            deleted.add(row_id)
+        else:
+            deleted.discard(row_id)
+            upserted.add(row_id)
+    return upserted, deleted
+
+def is_log_complete_since(version, db_path='math.db'):
+    """Check that no change newer than a version has been pruned from the log"""
+    if get_data_version(db_path) <= int(version):
+        return True
+    conn = get_connection(db_path)
+    try:
+        oldest = conn.execute("SELECT MIN(version) FROM change_log").fetchone()[0]
+    finally:
+        conn.close()
+    return oldest is not None and oldest <= int(version) + 1
+
+def record_subscriber_version(conn, name, version):
+    """
+    Record on an open connection that a subscriber has processed all changes up to a version
+
+    Subscribers are consumers that read the change log incrementally (e.g. the
+    recommender); pruning never deletes entries a subscriber has not processed yet.
+    Meant to be called inside the subscriber's own write transaction.
+    """
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS change_log_subscribers (name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+    )
+    conn.execute(
+        """
+        INSERT INTO change_log_subscribers (name, version) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET version = excluded.version
+        """,
+        (name, int(version))
+    )
+
+def get_subscriber_versions(db_path='math.db'):
+    """Get the version each subscriber has processed, as a dict name -> version"""
+    conn = get_connection(db_path)
+    try:
+        rows = conn.execute("SELECT name, version FROM change_log_subscribers").fetchall()
+    except Exception:
+        rows = []
+    finally:
+        conn.close()
+    return {name: int(version) for name, version in rows}
+
+def unregister_subscriber(name, db_path='math.db'):
+    """Remove a subscriber so that it no longer holds back pruning"""
+    execute_write("DELETE FROM change_log_subscribers WHERE name = ?", (name,), db_path=db_path)
+
+def prune_change_log(before_version=None, db_path='math.db'):
+    """
+    Delete change log entries that no subscriber still needs
+
+    Args:
+        before_version: Delete entries at or below this version; defaults to the
+            current data version. It is clamped to the lowest version processed by
+            any subscriber.
+        db_path: Path to the database
+
+    Returns:
+        The version entries were deleted up to
+    """
+    def prune(conn):
+        limit = before_version
+        if limit is None:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+            limit = row[0] if row else 0
+        oldest = conn.execute("SELECT MIN(version) FROM change_log_subscribers").fetchone()[0]
+        if oldest is not None:
+            limit = min(int(limit), int(oldest))
+        conn.execute("DELETE FROM change_log WHERE version <= ?", (int(limit),))
+        return int(limit)
+
+    return execute_write(prune, db_path=db_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune the change log")
+    parser.add_argument("--db", default="math.db", help="Path to the database")
+    parser.add_argument("--before", type=int, default=None,
+                        help="Prune entries up to this version (default: all that no subscriber needs)")
+    args = parser.parse_args()
+
+    ensure_change_log(args.db)
+    version = prune_change_log(args.before, args.db)
+    print(f"Pruned change log entries up to version {version}")
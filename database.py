@@ -1,11 +1,17 @@
+import queue
+import atexit
 import sqlite3
+import threading
+from concurrent.futures import Future
 import pandas as pd
+from tracing import traced
 
 def get_connection(db_path='math.db'):
     """Create a connection to the SQLite database"""
     conn = sqlite3.connect(db_path)
     return conn
 
+@traced
 def execute_query(query, params=None, db_path='math.db'):
     """Execute a query and return the results as a pandas DataFrame"""
     try:
@@ -37,4 +43,191 @@ def get_distinct_values(table, column, db_path='math.db'):
     """Get all distinct values for a specific column in a table"""
     query = f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY {column}"
     result = execute_query(query, db_path=db_path)
-    return result[column].tolist()
\ No newline at end of file
+    return result[column].tolist()
+
+class DatabaseWriter:
+    """
+    Single writer thread that applies all mutations to one database
+
+    Writes are queued and applied by a dedicated thread in batches, each batch in
+    one transaction (group commit). Every write runs inside its own savepoint so a
+    failing write does not affect the rest of its batch. The database is switched
+    to WAL mode so readers are never blocked by the writer.
+    """
+
+    def __init__(self, db_path='math.db', max_queue_size=1000, max_batch_size=200, put_timeout=5.0):
+        self.db_path = db_path
+        self.max_batch_size = max_batch_size
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name=f"DatabaseWriter({db_path})", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, sql, params=None, many=False):
+        """
+        Queue a write and return a Future resolving once it is committed
+
+        Args:
+            sql: SQL statement, or a callable taking the connection for multi-statement writes
+            params: Statement parameters (a sequence of parameter tuples if many is True)
+            many: Use executemany instead of execute
+
+        Returns:
+            concurrent.futures.Future with the statement's lastrowid and rowcount as a
+            dict, or the callable's return value
+
+        Raises:
+            Exception: If the queue stays full for longer than put_timeout (backpressure)
+        """
+        future = Future()
+        try:
+            self._queue.put((sql, params, many, future), timeout=self.put_timeout)
+        except queue.Full:
+            raise Exception(f"Write queue is full\nPath: {self.db_path}")
+        return future
+
+    def close(self, timeout=None):
+        """Apply all queued writes and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        """Block for the next write, then collect whatever else is already queued"""
+        batch = [self._queue.get()]
+        while batch[-1] is not None and len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, conn, sql, params, many):
+        """Apply one write on the writer's connection"""
+        if callable(sql):
+            return sql(conn)
+        if many:
+            cursor = conn.executemany(sql, params or [])
+        else:
+            cursor = conn.execute(sql, params or ())
+        return {'lastrowid': cursor.lastrowid, 'rowcount': cursor.rowcount}
+
+    def _apply_batch(self, conn, batch):
+        """Apply a batch of writes in one transaction and resolve their futures"""
+        # Writes cancelled while queued are dropped; the rest can no longer be cancelled
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params, many, future in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    result = self._apply(conn, sql, params, many)
+                    conn.execute("RELEASE write")
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            error = Exception(f"Database error: {str(e)}\nPath: {self.db_path}")
+            outcomes = [(future, None, error) for _, _, _, future in batch]
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _run(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            batch = self._next_batch()
+            if batch[-1] is None:
+                stopping = True
+                batch.pop()
+            if not batch:
+                continue
+            try:
+                if conn is None:
+                    conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                self._apply_batch(conn, batch)
+            except Exception as e:
+                # Never let the only writer of the database die: fail this batch and
+                # reconnect for the next one
+                error = Exception(f"Database error: {str(e)}\nPath: {self.db_path}")
+                for _, _, _, future in batch:
+                    if not future.done():
+                        try:
+                            future.set_exception(error)
+                        except Exception:
+                            pass
+                if conn is not None:
+                    conn.close()
+                    conn = None
+        if conn is not None:
+            conn.close()
+
+# One writer per database path
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_writer(db_path='math.db'):
+    """Get the shared writer of a database, starting it on first use"""
+    with _writers_lock:
+        writer = _writers.get(db_path)
+        if writer is None:
+            writer = DatabaseWriter(db_path)
+            _writers[db_path] = writer
+        return writer
+
+def submit_write(query, params=None, db_path='math.db', many=False):
+    """Queue a write on the database's writer thread and return its Future"""
+    return get_writer(db_path).submit(query, params, many)
+
+def execute_write(query, params=None, db_path='math.db', many=False, timeout=None):
+    """Queue a write and wait for it to be committed"""
+    return submit_write(query, params, db_path, many).result(timeout)
+
+def split_statements(script):
+    """Split an SQL script into complete statements (trigger bodies stay whole)"""
+    statements, current = [], ""
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    if current.strip():
+        statements.append(current.strip())
+    return statements
+
+def execute_script_write(script, db_path='math.db', timeout=None):
+    """Run a multi-statement SQL script as one write on the writer thread"""
+    statements = split_statements(script)
+
+    def run_script(conn):
+        for statement in statements:
+            conn.execute(statement)
+
+    return execute_write(run_script, db_path=db_path, timeout=timeout)
+
+@atexit.register
+def close_writers():
+    """Flush and stop all writer threads"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
@@ -0,0 +1,298 @@
+import os
+import zlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import streamlit as st
+import pandas as pd
+from database import get_connection, execute_query, get_all_tables, execute_write
+
+# MinHash parameters: NUM_BANDS * ROWS_PER_BAND hash functions; pairs with Jaccard
+# similarity around (1 / NUM_BANDS) ** (1 / ROWS_PER_BAND) or above become candidates
+NUM_BANDS = 32
+ROWS_PER_BAND = 4
+NUM_PERMUTATIONS = NUM_BANDS * ROWS_PER_BAND
+SHINGLE_SIZE = 5
+MERSENNE_PRIME = (1 << 31) - 1
+
+# Buckets larger than this (e.g. many copies of one imported definition) are not
+# expanded into all pairs, which would be quadratic; each member is paired with
+# the bucket's first member instead
+MAX_BUCKET_SIZE = 100
+
+REVIEW_STATUSES = ["pending", "duplicate", "not_duplicate"]
+
+DUPLICATES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS duplicate_candidates (
+    entity_id_a INTEGER NOT NULL,
+    entity_id_b INTEGER NOT NULL,
+    similarity REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY (entity_id_a, entity_id_b)
+);
+CREATE INDEX IF NOT EXISTS idx_duplicate_candidates_status ON duplicate_candidates (status, similarity);
+"""
+
+def get_hash_parameters(seed=1):
+    """Random (a, b) coefficients of the universal hash functions"""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+    b = rng.randint(0, MERSENNE_PRIME, size=NUM_PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+    return a, b
+
+def shingle_hashes(text):
+    """Hash the character shingles of normalised text into 31-bit integers"""
+    text = " ".join(text.lower().split())
+    if len(text) < SHINGLE_SIZE:
+        shingles = {text} if text else set()
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) & MERSENNE_PRIME for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+
+def compute_signatures(rows, seed=1):
+    """
+    Compute MinHash signatures for a chunk of (id, name, description, latex_content) rows
+
+    Returns:
+        Tuple (ids, signatures) with one uint32 signature row per entity that has text
+    """
+    a, b = get_hash_parameters(seed)
+    ids = []
+    signatures = []
+    for entity_id, name, description, latex_content in rows:
+        text = " ".join(part for part in (name, description, latex_content) if part)
+        hashes = shingle_hashes(text)
+        if len(hashes) == 0:
+            continue
+        # (a * h + b) mod p for every shingle and hash function, then the minimum
+        permuted = (np.outer(hashes, a) + b) % MERSENNE_PRIME
+        signatures.append(permuted.min(axis=0).astype(np.uint32))
+        ids.append(entity_id)
+    if not ids:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, NUM_PERMUTATIONS), dtype=np.uint32)
+    return np.asarray(ids, dtype=np.int64), np.vstack(signatures)
+
+def iter_entity_chunks(db_path='math.db', chunk_size=5000):
+    """Stream entity text in chunks of rows"""
+    conn = get_connection(db_path)
+    try:
+        cursor = conn.execute(
+            "SELECT id, name, description, latex_content FROM math_entities ORDER BY id"
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def compute_all_signatures(db_path='math.db', workers=None, chunk_size=5000, seed=1):
+    """
+    Compute MinHash signatures for all entities on a process pool
+
+    Returns:
+        Tuple (ids, signatures)
+    """
+    workers = workers or os.cpu_count() or 1
+    id_parts, signature_parts = [], []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for rows in iter_entity_chunks(db_path, chunk_size):
+            pending.append(executor.submit(compute_signatures, rows, seed))
+            # Bound the number of chunks held in memory at once
+            if len(pending) >= 2 * workers:
+                ids, signatures = pending.pop(0).result()
+                id_parts.append(ids)
+                signature_parts.append(signatures)
+        for future in pending:
+            ids, signatures = future.result()
+            id_parts.append(ids)
+            signature_parts.append(signatures)
+    if not id_parts:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, NUM_PERMUTATIONS), dtype=np.uint32)
+    return np.concatenate(id_parts), np.vstack(signature_parts)
+
+def find_candidate_pairs(signatures):
+    """
+    Find row pairs sharing at least one LSH band bucket
+
+    Buckets with more than MAX_BUCKET_SIZE members yield a star of pairs around
+    their first member rather than every pair.
+
+    Returns:
+        Set of (row_i, row_j) tuples with row_i < row_j
+    """
+    pairs = set()
+    n = len(signatures)
+    if n < 2:
+        return pairs
+    for band in range(NUM_BANDS):
+        band_rows = np.ascontiguousarray(
+            signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        )
+        keys = band_rows.view(np.dtype((np.void, band_rows.dtype.itemsize * ROWS_PER_BAND))).ravel()
+        _, bucket_of, bucket_sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        shared = np.flatnonzero(bucket_sizes[bucket_of] > 1)
+        if len(shared) == 0:
+            continue
+        order = shared[np.argsort(bucket_of[shared], kind='stable')]
+        buckets = bucket_of[order]
+        boundaries = np.flatnonzero(np.diff(buckets)) + 1
+        for members in np.split(order, boundaries):
+            if len(members) > MAX_BUCKET_SIZE:
+                representative = int(members[0])
+                pairs.update((representative, int(member)) for member in members[1:])
+                continue
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    pairs.add((int(members[i]), int(members[j])))
+    return pairs
+
+def find_duplicates(db_path='math.db', threshold=0.8, workers=None, seed=1):
+    """
+    Find near-duplicate entity pairs with MinHash LSH
+
+    Returns:
+        DataFrame with entity_id_a, entity_id_b and estimated Jaccard similarity
+    """
+    ids, signatures = compute_all_signatures(db_path, workers, seed=seed)
+    pairs = find_candidate_pairs(signatures)
+    if not pairs:
+        return pd.DataFrame(columns=['entity_id_a', 'entity_id_b', 'similarity'])
+    rows = np.array(sorted(pairs), dtype=np.int64)
+    similarity = (signatures[rows[:, 0]] == signatures[rows[:, 1]]).mean(axis=1)
+    keep = similarity >= threshold
+    return pd.DataFrame({
+        'entity_id_a': ids[rows[keep, 0]],
+        'entity_id_b': ids[rows[keep, 1]],
+        'similarity': similarity[keep].round(3),
+    })
+
+def build_duplicate_candidates(db_path='math.db', threshold=0.8, workers=None):
+    """
+    Refresh the duplicate_candidates review table
+
+    Pending candidates are replaced; pairs that were already reviewed keep their status.
+
+    Returns:
+        Number of candidate pairs found
+    """
+    duplicates = find_duplicates(db_path, threshold, workers)
+    conn = get_connection(db_path)
+    try:
+        conn.executescript(DUPLICATES_TABLE_SQL)
+        conn.execute("DELETE FROM duplicate_candidates WHERE status = 'pending'")
+        conn.executemany(
+            """
+            INSERT INTO duplicate_candidates (entity_id_a, entity_id_b, similarity)
+            VALUES (?, ?, ?)
+            ON CONFLICT (entity_id_a, entity_id_b) DO UPDATE SET similarity = excluded.similarity
+            """,
+            duplicates.itertuples(index=False, name=None)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return len(duplicates)
+
+def get_duplicate_candidates(status='pending', min_similarity=0.0, limit=500, db_path='math.db'):
+    """Get candidate pairs with both entities' names and types"""
+    query = """
+    SELECT d.entity_id_a, a.name as name_a, a.type as type_a,
+           d.entity_id_b, b.name as name_b, b.type as type_b,
+           d.similarity, d.status
+    FROM duplicate_candidates d
+    JOIN math_entities a ON a.id = d.entity_id_a
+    JOIN math_entities b ON b.id = d.entity_id_b
+    WHERE d.status = ? AND d.similarity >= ?
+    ORDER BY d.similarity DESC, d.entity_id_a, d.entity_id_b
+    LIMIT ?
+    """
+    return execute_query(query, params=(status, min_similarity, int(limit)), db_path=db_path)
+
+def set_review_status(entity_id_a, entity_id_b, status, db_path='math.db'):
+    """Record the review decision for a candidate pair through the writer queue"""
+    if status not in REVIEW_STATUSES:
+        raise ValueError(f"Unknown review status: {status}")
+    return execute_write(
+        "UPDATE duplicate_candidates SET status = ? WHERE entity_id_a = ? AND entity_id_b = ?",
+        (status, int(entity_id_a), int(entity_id_b)),
+        db_path=db_path
+    )
+
+def display_duplicates_page(db_path='math.db'):
+    """
+    Display the near-duplicate review queue
+    """
+    st.header("Duplicate Review")
+    if 'duplicate_candidates' not in get_all_tables(db_path):
+        st.info("No duplicate candidates yet. Run `python dedup.py` to detect near-duplicate entities.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        status = st.selectbox("Status:", options=REVIEW_STATUSES, key="dedup_status")
+    with col2:
+        min_similarity = st.slider("Minimum similarity:", 0.0, 1.0, 0.8, 0.05, key="dedup_min_similarity")
+
+    candidates = get_duplicate_candidates(status, min_similarity, db_path=db_path)
+    if candidates.empty:
+        st.info("No candidate pairs match the current filters.")
+        return
+
+    st.write(f"Showing {len(candidates)} candidate pairs.")
+    st.dataframe(candidates, use_container_width=True, hide_index=True)
+
+    pair = st.selectbox(
+        "Review pair:",
+        options=list(candidates.index),
+        format_func=lambda i: (f"{candidates.at[i, 'name_a']} ({candidates.at[i, 'entity_id_a']}) / "
+                               f"{candidates.at[i, 'name_b']} ({candidates.at[i, 'entity_id_b']}) "
+                               f"- {candidates.at[i, 'similarity']}"),
+        key="dedup_pair"
+    )
+    id_a = int(candidates.at[pair, 'entity_id_a'])
+    id_b = int(candidates.at[pair, 'entity_id_b'])
+
+    details = execute_query(
+        "SELECT * FROM math_entities WHERE id IN (?, ?)", params=(id_a, id_b), db_path=db_path
+    ).set_index('id')
+    columns = st.columns(2)
+    for column, entity_id in zip(columns, (id_a, id_b)):
+        with column:
+            if entity_id not in details.index:
+                st.warning(f"Entity {entity_id} no longer exists")
+                continue
+            entity = details.loc[entity_id]
+            st.markdown(f"**{entity['name']}** ({entity['type']}, ID: {entity_id})")
+            st.write(f"**Course:** {entity['course']}")
+            if pd.notna(entity['description']):
+                st.write(entity['description'])
+            if pd.notna(entity['latex_content']):
+                st.markdown(entity['latex_content'])
+
+    col1, col2, col3 = st.columns(3)
+    if col1.button("Mark as duplicate"):
+        set_review_status(id_a, id_b, "duplicate", db_path)
+        st.rerun()
+    if col2.button("Not a duplicate"):
+        set_review_status(id_a, id_b, "not_duplicate", db_path)
+        st.rerun()
+    if status != "pending" and col3.button("Reset to pending"):
+        set_review_status(id_a, id_b, "pending", db_path)
+        st.rerun()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect near-duplicate entities with MinHash LSH")
+    parser.add_argument("--db", default="math.db", help="Path to the database")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Minimum estimated Jaccard similarity")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    args = parser.parse_args()
+
+    count = build_duplicate_candidates(args.db, args.threshold, args.workers)
+    print(f"Found {count} candidate duplicate pairs")
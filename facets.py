@@ -0,0 +1,176 @@
+import threading
+import numpy as np
+from database import get_connection
+from change_log import get_data_version
+
+# Facets indexed over math_entities. Each maps to a query returning (entity_id, value) rows.
+FACET_QUERIES = {
+    'type': "SELECT id, type FROM math_entities WHERE type IS NOT NULL",
+    'course': "SELECT id, course FROM math_entities WHERE course IS NOT NULL",
+}
+
+# Bitmaps holding fewer than 1/SPARSE_RATIO of all entities are stored as sorted
+# row index arrays; denser ones as packed bit arrays (as in roaring bitmaps)
+SPARSE_RATIO = 32
+
+# Cached facet indexes, keyed by db_path, holding (data_version, index)
+_index_cache = {}
+_index_lock = threading.Lock()
+
+def _make_bitmap(rows, n):
+    """Store a sorted array of row indices as a sparse or packed dense bitmap"""
+    if len(rows) * SPARSE_RATIO < n:
+        return ('sparse', rows.astype(np.int32))
+    mask = np.zeros(n, dtype=bool)
+    mask[rows] = True
+    return ('dense', np.packbits(mask))
+
+def bitmap_to_mask(bitmap, n):
+    """Expand a bitmap into a boolean mask over all entity rows"""
+    kind, data = bitmap
+    if kind == 'dense':
+        return np.unpackbits(data, count=n).astype(bool)
+    mask = np.zeros(n, dtype=bool)
+    mask[data] = True
+    return mask
+
+def bitmap_count(bitmap, mask=None):
+    """Count the entities in a bitmap, optionally intersected with a boolean mask"""
+    kind, data = bitmap
+    if mask is None:
+        if kind == 'sparse':
+            return len(data)
+        return int(np.unpackbits(data).sum())
+    if kind == 'sparse':
+        return int(np.count_nonzero(mask[data]))
+    return int(np.count_nonzero(np.unpackbits(data, count=len(mask)).astype(bool) & mask))
+
+def build_facet_index(db_path='math.db'):
+    """
+    Build bitmaps for every entity type and course
+
+    Returns:
+        Dict with entity_ids (sorted array mapping rows to ids), n, and facets
+        mapping facet name -> value -> bitmap
+    """
+    conn = get_connection(db_path)
+    try:
+        entity_ids = np.array(
+            [row[0] for row in conn.execute("SELECT id FROM math_entities ORDER BY id")],
+            dtype=np.int64
+        )
+        n = len(entity_ids)
+        facets = {}
+        for facet, query in FACET_QUERIES.items():
+            pairs = conn.execute(query).fetchall()
+            if not pairs:
+                facets[facet] = {}
+                continue
+            ids = np.array([pair[0] for pair in pairs], dtype=np.int64)
+            values = np.array([pair[1] for pair in pairs], dtype=object)
+            rows = np.searchsorted(entity_ids, ids)
+            rows[rows == n] = 0
+            valid = entity_ids[rows] == ids if n else np.zeros(len(ids), dtype=bool)
+            rows, values = rows[valid], values[valid]
+            unique_values, codes = np.unique(values.astype(str), return_inverse=True)
+            order = np.lexsort((rows, codes))
+            rows, codes = rows[order], codes[order]
+            boundaries = np.searchsorted(codes, np.arange(len(unique_values) + 1))
+            facets[facet] = {
+                value: _make_bitmap(np.unique(rows[boundaries[i]:boundaries[i + 1]]), n)
+                for i, value in enumerate(unique_values.tolist())
+            }
+    finally:
+        conn.close()
+    return {'entity_ids': entity_ids, 'n': n, 'facets': facets}
+
+def get_facet_index(db_path='math.db'):
+    """Get the facet index of a database, rebuilding it only when the data changed"""
+    version = get_data_version(db_path)
+    with _index_lock:
+        cached = _index_cache.get(db_path)
+        if cached and cached[0] == version:
+            return cached[1]
+    index = build_facet_index(db_path)
+    with _index_lock:
+        _index_cache[db_path] = (version, index)
+    return index
+
+def _normalize_selections(selections):
+    """Turn {facet: value or list of values} into {facet: list}, dropping "All"/empty"""
+    normalized = {}
+    for facet, values in (selections or {}).items():
+        if values is None or values == "All":
+            continue
+        if isinstance(values, str):
+            values = [values]
+        values = [value for value in values if value != "All"]
+        if values:
+            normalized[facet] = values
+    return normalized
+
+def evaluate_selections(index, selections, exclude_facet=None):
+    """
+    Evaluate a filter combination as a boolean mask over entity rows
+
+    Values within one facet are OR-ed, facets are AND-ed together.
+
+    Args:
+        index: Facet index from get_facet_index
+        selections: Dict mapping facet name to a value or list of values
+        exclude_facet: Facet to ignore, used when counting that facet's options
+
+    Returns:
+        Boolean mask, or None when no filter applies
+    """
+    mask = None
+    n = index['n']
+    for facet, values in _normalize_selections(selections).items():
+        if facet == exclude_facet:
+            continue
+        facet_mask = np.zeros(n, dtype=bool)
+        for value in values:
+            bitmap = index['facets'].get(facet, {}).get(value)
+            if bitmap is not None:
+                facet_mask |= bitmap_to_mask(bitmap, n)
+        mask = facet_mask if mask is None else mask & facet_mask
+    return mask
+
+def count_matches(index, selections):
+    """Count entities matching a filter combination"""
+    mask = evaluate_selections(index, selections)
+    return index['n'] if mask is None else int(np.count_nonzero(mask))
+
+def get_facet_counts(index, facet, selections=None):
+    """
+    Count, for every value of a facet, the entities that would match if it were selected
+
+    The facet's own current selection is ignored so that every option shows the
+    number of results picking it would give. Counts are numbers of entities.
+
+    Returns:
+        Dict mapping each value (and "All") to its count
+    """
+    mask = evaluate_selections(index, selections, exclude_facet=facet)
+    counts = {
+        value: bitmap_count(bitmap, mask)
+        for value, bitmap in index['facets'].get(facet, {}).items()
+    }
+    counts["All"] = index['n'] if mask is None else int(np.count_nonzero(mask))
+    return counts
+
+def format_counts_caption(counts, limit=10):
+    """
+    Summarise option counts in one line, largest first, for a caption under a filter
+
+    Counts are kept out of the selectbox options: on older Streamlit versions the
+    displayed options are part of the widget's identity, so changing counts would
+    reset the selection.
+    """
+    values = sorted((value for value in counts if value != "All"), key=lambda value: (-counts[value], str(value)))
+    parts = [f"{value} {counts[value]}" for value in values[:limit]]
+    if "All" in counts:
+        parts.insert(0, f"All {counts['All']}")
+    if len(values) > limit:
+        parts.append(f"{len(values) - limit} more")
+    return " · ".join(parts)
@@ -0,0 +1,234 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+import pandas as pd
+from database import execute_query
+from change_log import get_data_version
+from query_templates import (
+    get_filtered_entities_query,
+    get_filtered_relationships_query,
+    get_filtered_tags_query
+)
+from utils import (
+    get_course_options,
+    get_type_options,
+    get_relationship_options,
+    get_tag_options
+)
+from search import cached_search
+
+# Cached per-database option lists, keyed by (option function name, db_path)
+# and holding (database fingerprint, options)
+_options_cache = {}
+
+def parse_db_paths(text):
+    """Parse database paths entered one per line, dropping blanks and duplicates"""
+    paths = []
+    for line in text.splitlines():
+        path = line.strip()
+        if path and path not in paths:
+            paths.append(path)
+    return paths
+
+def _database_fingerprint(db_path):
+    """Cheap value that changes whenever a database file is modified"""
+    try:
+        mtime = os.path.getmtime(db_path)
+    except OSError:
+        mtime = None
+    return (mtime, get_data_version(db_path))
+
+def _run_on_databases(func, db_paths, max_workers=None):
+    """
+    Run func(db_path) for every database concurrently on a thread pool
+
+    Returns:
+        Tuple (results, errors) of dicts keyed by db_path
+    """
+    results, errors = {}, {}
+    if not db_paths:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(db_paths), 32)) as executor:
+        futures = {db_path: executor.submit(func, db_path) for db_path in db_paths}
+        for db_path, future in futures.items():
+            try:
+                results[db_path] = future.result()
+            except Exception as e:
+                errors[db_path] = str(e)
+    return results, errors
+
+def merge_results(results, db_paths, sort_by=None, ascending=True):
+    """
+    Merge per-database DataFrames into one with a leading source column
+
+    Rows keep the order of db_paths and their per-database order; with sort_by the
+    merged frame is stably sorted so ties keep that order.
+    """
+    frames = []
+    for db_path in db_paths:
+        frame = results.get(db_path)
+        if frame is None or frame.empty:
+            continue
+        frame = frame.copy()
+        frame.insert(0, 'source', db_path)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames, ignore_index=True)
+    if sort_by:
+        merged = merged.sort_values(sort_by, ascending=ascending, kind='mergesort', ignore_index=True)
+    return merged
+
+def federated_query(query, db_paths, params=None, sort_by=None, ascending=True, max_workers=None):
+    """
+    Execute the same query against several databases in parallel
+
+    Args:
+        query: SQL query to run
+        db_paths: List of database paths
+        params: Optional query parameters
+        sort_by: Optional column or list of columns to order the merged result by
+        ascending: Sort direction for sort_by
+        max_workers: Size of the thread pool; defaults to one thread per database
+
+    Returns:
+        Tuple (DataFrame with a source column, dict of errors keyed by db_path)
+    """
+    results, errors = _run_on_databases(
+        lambda db_path: execute_query(query, params=params, db_path=db_path),
+        db_paths,
+        max_workers
+    )
+    return merge_results(results, db_paths, sort_by, ascending), errors
+
+def federated_search(query, search_in, entity_types, courses, case_sensitive, db_paths, max_workers=None):
+    """
+    Run the cached search against several databases in parallel
+
+    A failing search raises on its pool thread and is reported in errors; failed
+    searches are not cached, so the database is searched again next time. Results
+    are grouped by database in the order of db_paths, each in its search order.
+
+    Returns:
+        Tuple (DataFrame with a source column, dict of errors keyed by db_path)
+    """
+    results, errors = _run_on_databases(
+        lambda db_path: cached_search(query, search_in, entity_types, courses, case_sensitive, db_path),
+        db_paths,
+        max_workers
+    )
+    # Importance is PageRank, which sums to 1 within each database, so it is not
+    # comparable across databases; keep each database's own ranking, grouped by source
+    return merge_results(results, db_paths), errors
+
+def get_cached_options(option_func, db_path):
+    """Get a filter option list for one database, cached until the database changes"""
+    key = (option_func.__name__, db_path)
+    fingerprint = _database_fingerprint(db_path)
+    cached = _options_cache.get(key)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+    options = option_func(db_path)
+    _options_cache[key] = (fingerprint, options)
+    return options
+
+def get_federated_options(option_func, db_paths):
+    """
+    Get the union of a filter option list across databases
+
+    The leading "All" option is kept first and the remaining values are sorted.
+    """
+    results, _ = _run_on_databases(
+        lambda db_path: get_cached_options(option_func, db_path),
+        db_paths
+    )
+    values = set()
+    for options in results.values():
+        values.update(option for option in options if option != "All")
+    return ["All"] + sorted(values)
+
+def _show_errors(errors):
+    for db_path, error in errors.items():
+        st.warning(f"Query failed for {db_path}: {error}")
+
+def display_federation_page(db_paths):
+    """
+    Display entities, relationships, tags and search results across several databases
+    """
+    st.header("Federated Databases")
+    if not db_paths:
+        st.info("Enter one database path per line in the sidebar to query them together.")
+        return
+    st.markdown(f"Querying {len(db_paths)} databases: " + ", ".join(f"`{p}`" for p in db_paths))
+
+    tabs = st.tabs(["Math Entities", "Relationships", "Tags", "Search"])
+
+    with tabs[0]:
+        col1, col2 = st.columns(2)
+        with col1:
+            type_filter = st.selectbox(
+                "Filter by Type",
+                options=get_federated_options(get_type_options, db_paths),
+                key="fed_entity_type"
+            )
+        with col2:
+            course_filter = st.selectbox(
+                "Filter by Course",
+                options=get_federated_options(get_course_options, db_paths),
+                key="fed_entity_course"
+            )
+        query = get_filtered_entities_query(type_value=type_filter, course_value=course_filter)
+        entities_df, errors = federated_query(query, db_paths)
+        _show_errors(errors)
+        if not entities_df.empty:
+            st.write(f"Found {len(entities_df)} entities matching your criteria.")
+            st.dataframe(entities_df, use_container_width=True)
+        else:
+            st.info("No entities found with the current filters.")
+
+    with tabs[1]:
+        relationship_filter = st.selectbox(
+            "Filter by Relationship Type",
+            options=get_federated_options(get_relationship_options, db_paths),
+            key="fed_rel_type"
+        )
+        query = get_filtered_relationships_query(relationship_value=relationship_filter)
+        relationships_df, errors = federated_query(query, db_paths)
+        _show_errors(errors)
+        if not relationships_df.empty:
+            st.write(f"Found {len(relationships_df)} relationships matching your criteria.")
+            st.dataframe(relationships_df, use_container_width=True)
+        else:
+            st.info("No relationships found with the current filters.")
+
+    with tabs[2]:
+        tag_filter = st.selectbox(
+            "Filter by Tag",
+            options=get_federated_options(get_tag_options, db_paths),
+            key="fed_tag_value"
+        )
+        query = get_filtered_tags_query(tag_value=tag_filter)
+        tags_df, errors = federated_query(query, db_paths)
+        _show_errors(errors)
+        if not tags_df.empty:
+            st.write(f"Found {len(tags_df)} tags matching your criteria.")
+            st.dataframe(tags_df, use_container_width=True)
+        else:
+            st.info("No tags found with the current filters.")
+
+    with tabs[3]:
+        search_query = st.text_input("Enter search term:", key="fed_search_query")
+        search_in = st.multiselect(
+            "Search in:",
+            options=["Names", "Descriptions", "LaTeX Content", "Tags"],
+            default=["Names", "Descriptions", "Tags"],
+            key="fed_search_in"
+        )
+        if search_query:
+            results, errors = federated_search(search_query, search_in, [], [], False, db_paths)
+            _show_errors(errors)
+            if not results.empty:
+                st.success(f"Found {len(results)} results matching '{search_query}'")
+                st.dataframe(results, use_container_width=True)
+            else:
+                st.info(f"No results found for '{search_query}'")
@@ -0,0 +1,424 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import resource
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+from database import execute_query, execute_write, DatabaseWriter
+from query_templates import (
+    get_filtered_entities_query,
+    get_filtered_relationships_query,
+    get_filtered_tags_query
+)
+from utils import (
+    get_course_options,
+    get_type_options,
+    get_relationship_options,
+    get_tag_options,
+    format_dataframe_for_display
+)
+from search import perform_search
+from stats import ensure_summary_tables
+from change_log import ensure_change_log
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS math_entities (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    course TEXT,
+    parent_id INTEGER REFERENCES math_entities(id),
+    sequence_num INTEGER,
+    description TEXT,
+    latex_content TEXT
+);
+CREATE TABLE IF NOT EXISTS relationships (
+    id INTEGER PRIMARY KEY,
+    subject_id INTEGER NOT NULL REFERENCES math_entities(id),
+    relationship TEXT NOT NULL,
+    object_id INTEGER NOT NULL REFERENCES math_entities(id),
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    entity_id INTEGER NOT NULL REFERENCES math_entities(id),
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_relationships_subject ON relationships (subject_id);
+CREATE INDEX IF NOT EXISTS idx_relationships_object ON relationships (object_id);
+CREATE INDEX IF NOT EXISTS idx_tags_entity ON tags (entity_id);
+"""
+
+ENTITY_TYPES = ["concept", "property", "theorem", "proof", "proof_step",
+                "definition", "exercise", "lemma", "corollary"]
+RELATIONSHIP_TYPES = ["has_property", "implies", "equivalent_to", "uses", "generalizes",
+                      "specializes", "prerequisite_for", "part_of", "derived_from", "example_of"]
+COURSES = ["Linear Algebra", "Real Analysis", "Abstract Algebra", "Topology",
+           "Probability", "Number Theory", "Complex Analysis", "Differential Equations"]
+VOCABULARY = ["group", "ring", "field", "vector", "space", "matrix", "linear", "map", "kernel",
+              "image", "norm", "metric", "limit", "continuous", "compact", "open", "set",
+              "prime", "integer", "measure", "integral", "derivative", "series", "basis"]
+LATEX_SNIPPETS = [r"\int_a^b f(x)\,dx", r"\sum_{n=1}^\infty a_n", r"\lim_{x \to 0}",
+                  r"\mathbb{R}^n", r"\ker(T)", r"\|x\|", r"\forall \epsilon > 0"]
+
+def create_synthetic_database(db_path, n_entities=10000, relationships_per_entity=3,
+                              tags_per_entity=2, seed=0):
+    """Create a synthetic database with the explorer's schema at db_path"""
+    rng = random.Random(seed)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(SCHEMA_SQL)
+        entities = []
+        for entity_id in range(1, n_entities + 1):
+            words = rng.sample(VOCABULARY, 3)
+            parent_id = rng.randint(1, entity_id - 1) if entity_id > 1 and rng.random() < 0.3 else None
+            entities.append((
+                entity_id,
+                " ".join(words).title(),
+                rng.choice(ENTITY_TYPES),
+                rng.choice(COURSES),
+                parent_id,
+                rng.randint(1, 20) if parent_id else None,
+                " ".join(rng.choices(VOCABULARY, k=20)),
+                " ".join(rng.sample(LATEX_SNIPPETS, 2))
+            ))
+        conn.executemany("INSERT INTO math_entities VALUES (?, ?, ?, ?, ?, ?, ?, ?)", entities)
+        conn.executemany(
+            "INSERT INTO relationships (subject_id, relationship, object_id) VALUES (?, ?, ?)",
+            ((rng.randint(1, n_entities), rng.choice(RELATIONSHIP_TYPES), rng.randint(1, n_entities))
+             for _ in range(n_entities * relationships_per_entity))
+        )
+        conn.executemany(
+            "INSERT INTO tags (entity_id, tag) VALUES (?, ?)",
+            ((rng.randint(1, n_entities), rng.choice(VOCABULARY))
+             for _ in range(n_entities * tags_per_entity))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    # The app installs these on first start
+    ensure_summary_tables(db_path)
+    ensure_change_log(db_path)
+
+def load_trace_options(db_path):
+    """Load the filter option lists a session would see in the sidebar widgets"""
+    max_id = execute_query("SELECT MAX(id) as max_id FROM math_entities", db_path=db_path)
+    return {
+        'types': get_type_options(db_path),
+        'courses': get_course_options(db_path),
+        'relationships': get_relationship_options(db_path),
+        'tags': get_tag_options(db_path),
+        'max_id': int(max_id['max_id'].iloc[0] or 1),
+    }
+
+def generate_session_trace(rng, options, n_actions, write_ratio=0.0):
+    """
+    Generate a realistic sequence of interactions for one session
+
+    Returns:
+        List of (action, kwargs) tuples
+    """
+    trace = []
+    for _ in range(n_actions):
+        roll = rng.random()
+        if roll < write_ratio:
+            trace.append(('write', {
+                'entity_id': rng.randint(1, options['max_id']),
+                'tag': rng.choice(VOCABULARY),
+            }))
+        elif roll < 0.35:
+            trace.append(('entities', {
+                'type_value': rng.choice(options['types']),
+                'course_value': rng.choice(options['courses']),
+            }))
+        elif roll < 0.45:
+            trace.append(('relationships', {
+                'relationship_value': rng.choice(options['relationships']),
+            }))
+        elif roll < 0.55:
+            trace.append(('tags', {
+                'tag_value': rng.choice(options['tags']),
+            }))
+        elif roll < 0.85:
+            trace.append(('search', {
+                'query': rng.choice(VOCABULARY)[:rng.randint(3, 6)],
+                'search_in': rng.choice([["Names"], ["Names", "Descriptions", "Tags"],
+                                         ["Names", "Descriptions", "LaTeX Content", "Tags"]]),
+                'entity_types': rng.sample(ENTITY_TYPES, rng.choice([0, 0, 1, 2])),
+            }))
+        else:
+            trace.append(('detail', {'entity_id': rng.randint(1, options['max_id'])}))
+    return trace
+
+def open_entity_detail(entity_id, db_path):
+    """Run the queries the entity detail view issues"""
+    execute_query(f"SELECT * FROM math_entities WHERE id = {entity_id}", db_path=db_path)
+    execute_query(f"""
+    SELECT r.relationship, m.name, m.type, r.description
+    FROM relationships r
+    JOIN math_entities m ON r.object_id = m.id
+    WHERE r.subject_id = {entity_id}
+    """, db_path=db_path)
+    execute_query(f"""
+    SELECT r.relationship, m.name, m.type, r.description
+    FROM relationships r
+    JOIN math_entities m ON r.subject_id = m.id
+    WHERE r.object_id = {entity_id}
+    """, db_path=db_path)
+    execute_query(f"SELECT tag FROM tags WHERE entity_id = {entity_id}", db_path=db_path)
+
+def write_tag(entity_id, tag, db_path):
+    """Insert a tag through the database's writer queue, as the app does"""
+    execute_write("INSERT INTO tags (entity_id, tag) VALUES (?, ?)", (entity_id, tag), db_path=db_path)
+
+def run_action(action, kwargs, db_path):
+    """Execute one traced interaction through the explorer's query code"""
+    if action == 'entities':
+        query = get_filtered_entities_query(**kwargs)
+        entities_df = execute_query(query, db_path=db_path)
+        format_dataframe_for_display(entities_df.head(200), 'math_entities', db_path)
+    elif action == 'relationships':
+        execute_query(get_filtered_relationships_query(**kwargs), db_path=db_path)
+    elif action == 'tags':
+        execute_query(get_filtered_tags_query(**kwargs), db_path=db_path)
+    elif action == 'search':
+        perform_search(kwargs['query'], kwargs['search_in'], kwargs['entity_types'], [], False, db_path)
+    elif action == 'detail':
+        open_entity_detail(kwargs['entity_id'], db_path)
+    elif action == 'write':
+        write_tag(kwargs['entity_id'], kwargs['tag'], db_path)
+
+def run_write_benchmark(db_path, writers=8, writes_per_writer=500, use_queue=True):
+    """
+    Measure write throughput under concurrent writers
+
+    With use_queue, every writer submits its inserts to one DatabaseWriter and waits
+    for the futures; otherwise each writer opens its own connection and commits
+    every insert, relying on SQLite's busy timeout. Both paths use WAL mode and
+    synchronous=NORMAL.
+
+    Returns:
+        Dict with total writes, elapsed seconds, writes per second and errors
+    """
+    errors = []
+    # Both paths run with the journal settings the writer uses, so that only the
+    # queueing differs (the journal mode persists in the database file)
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.close()
+    writer = DatabaseWriter(db_path) if use_queue else None
+    if writer is not None:
+        # Let the writer open its connection before timing starts
+        writer.submit("SELECT 1").result()
+
+    def queued_writer(writer_id):
+        futures = [
+            writer.submit("INSERT INTO tags (entity_id, tag) VALUES (?, ?)", (1, f"bench-{writer_id}"))
+            for _ in range(writes_per_writer)
+        ]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(str(e))
+
+    def direct_writer(writer_id):
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            for _ in range(writes_per_writer):
+                try:
+                    conn.execute("INSERT INTO tags (entity_id, tag) VALUES (?, ?)", (1, f"bench-{writer_id}"))
+                    conn.commit()
+                except sqlite3.OperationalError as e:
+                    errors.append(str(e))
+        finally:
+            conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as executor:
+        list(executor.map(queued_writer if use_queue else direct_writer, range(writers)))
+    if writer is not None:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    # Remove the benchmark rows again
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("DELETE FROM tags WHERE tag LIKE 'bench-%'")
+        conn.commit()
+    finally:
+        conn.close()
+
+    total = writers * writes_per_writer
+    return {
+        'writes': total,
+        'elapsed_s': elapsed,
+        'writes_per_s': total / elapsed if elapsed else 0.0,
+        'errors': len(errors),
+    }
+
+def current_rss_bytes():
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is the peak RSS, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def run_session(session_id, db_path, options, n_actions, write_ratio, think_time, seed):
+    """
+    Replay one session's trace
+
+    Returns:
+        Dict with per-action latencies, lock errors, errors and RSS
+    """
+    rng = random.Random(seed + session_id)
+    trace = generate_session_trace(rng, options, n_actions, write_ratio)
+    lock_stats = {'errors': 0, 'seconds': 0.0}
+    latencies = []
+    errors = 0
+    for action, kwargs in trace:
+        start = time.perf_counter()
+        try:
+            run_action(action, kwargs, db_path)
+        except Exception as e:
+            errors += 1
+            if "locked" in str(e):
+                # Only actions that gave up are seen here: a lock acquired within the
+                # busy timeout just shows up as latency
+                lock_stats['errors'] += 1
+                lock_stats['seconds'] += time.perf_counter() - start
+        latencies.append((action, time.perf_counter() - start))
+        if think_time:
+            time.sleep(rng.uniform(0, 2 * think_time))
+    return {
+        'latencies': latencies,
+        'lock_errors': lock_stats['errors'],
+        'lock_error_seconds': lock_stats['seconds'],
+        'errors': errors,
+        'pid': os.getpid(),
+        'rss': current_rss_bytes(),
+    }
+
+def summarize(results, elapsed, baseline_rss, mode, concurrency):
+    """Aggregate session results into a report dict"""
+    by_action = {}
+    for result in results:
+        for action, latency in result['latencies']:
+            by_action.setdefault(action, []).append(latency)
+    all_latencies = np.array([l for values in by_action.values() for l in values])
+
+    def percentiles(values):
+        values = np.asarray(values) * 1000
+        return {
+            'count': len(values),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)),
+            'p99_ms': float(np.percentile(values, 99)),
+        }
+
+    if mode == 'process':
+        # Sessions in a process pool: report each worker's own RSS
+        rss_by_pid = {}
+        for result in results:
+            rss_by_pid[result['pid']] = max(rss_by_pid.get(result['pid'], 0), result['rss'])
+        rss_per_session = float(np.mean(list(rss_by_pid.values())))
+    else:
+        # Sessions share a process, as in the Streamlit server
+        peak_rss = max(result['rss'] for result in results)
+        rss_per_session = max(peak_rss - baseline_rss, 0) / concurrency
+
+    return {
+        'sessions': len(results),
+        'actions': int(len(all_latencies)),
+        'elapsed_s': elapsed,
+        'throughput_per_s': len(all_latencies) / elapsed if elapsed else 0.0,
+        'overall': percentiles(all_latencies),
+        'by_action': {action: percentiles(values) for action, values in sorted(by_action.items())},
+        'lock_errors': sum(result['lock_errors'] for result in results),
+        'lock_error_seconds': sum(result['lock_error_seconds'] for result in results),
+        'errors': sum(result['errors'] for result in results),
+        'rss_per_session_mb': rss_per_session / (1024 * 1024),
+    }
+
+def run_load_test(db_path, concurrency=8, sessions=32, actions_per_session=20,
+                  write_ratio=0.0, think_time=0.0, mode='thread', seed=0):
+    """
+    Run sessions at the given concurrency and return a summary report
+
+    Args:
+        db_path: Path to the database under test
+        concurrency: Number of sessions running at the same time
+        sessions: Total number of sessions to replay
+        actions_per_session: Interactions per session
+        write_ratio: Fraction of interactions that insert a tag
+        think_time: Mean pause between interactions, in seconds
+        mode: 'thread' (sessions share one process, like Streamlit) or 'process'
+        seed: Random seed for trace generation
+    """
+    options = load_trace_options(db_path)
+    baseline_rss = current_rss_bytes()
+    executor_class = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+    start = time.perf_counter()
+    with executor_class(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(run_session, session_id, db_path, options,
+                            actions_per_session, write_ratio, think_time, seed)
+            for session_id in range(sessions)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    return summarize(results, elapsed, baseline_rss, mode, concurrency)
+
+def print_report(report):
+    """Print a load test report as a plain-text table"""
+    print(f"Sessions: {report['sessions']}  Actions: {report['actions']}  "
+          f"Elapsed: {report['elapsed_s']:.2f}s  Throughput: {report['throughput_per_s']:.1f} actions/s")
+    print(f"{'action':<15}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(report['by_action'].items()) + [('overall', report['overall'])]
+    for action, stats in rows:
+        print(f"{action:<15}{stats['count']:>8}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    print(f"Lock errors: {report['lock_errors']} ({report['lock_error_seconds']:.3f}s)  "
+          f"Errors: {report['errors']}  RSS per session: {report['rss_per_session_mb']:.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Math Database Explorer query paths")
+    parser.add_argument("--db", default="loadtest.db", help="Path to the database under test")
+    parser.add_argument("--create", action="store_true", help="Create a synthetic database first")
+    parser.add_argument("--entities", type=int, default=10000, help="Entities in the synthetic database")
+    parser.add_argument("--concurrency", type=int, default=8, help="Simultaneous sessions")
+    parser.add_argument("--sessions", type=int, default=32, help="Total sessions to replay")
+    parser.add_argument("--actions", type=int, default=20, help="Interactions per session")
+    parser.add_argument("--write-ratio", type=float, default=0.0, help="Fraction of interactions that write")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between interactions (s)")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread",
+                        help="Run sessions as threads (like Streamlit) or processes")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--write-benchmark", action="store_true",
+                        help="Compare write throughput with and without the single-writer queue")
+    parser.add_argument("--writes", type=int, default=500, help="Writes per writer in the write benchmark")
+    args = parser.parse_args()
+
+    if args.create:
+        create_synthetic_database(args.db, args.entities, seed=args.seed)
+    if args.write_benchmark:
+        for use_queue in (False, True):
+            result = run_write_benchmark(args.db, args.concurrency, args.writes, use_queue)
+            label = "writer queue" if use_queue else "direct connections"
+            print(f"{label:<20}{result['writes']:>8} writes  {result['elapsed_s']:>7.2f}s  "
+                  f"{result['writes_per_s']:>9.1f} writes/s  errors: {result['errors']}")
+        sys.exit(0)
+    report = run_load_test(args.db, args.concurrency, args.sessions, args.actions,
+                           args.write_ratio, args.think_time, args.mode, args.seed)
+    print_report(report)
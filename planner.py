@@ -0,0 +1,217 @@
+import json
+import streamlit as st
+import pandas as pd
+from database import get_connection, execute_query
+from change_log import get_data_version
+
+# Relationship types defining the prerequisite graph. For each type, the flag says
+# whether the subject has to be learned before the object (True) or after it (False).
+PREREQUISITE_RELATIONSHIPS = {
+    'prerequisite_for': True,
+    'derived_from': False,
+}
+
+# Cached prerequisite graphs, keyed by db_path, holding (data_version, graph)
+_graph_cache = {}
+
+def load_prerequisite_graph(db_path='math.db'):
+    """
+    Load the prerequisite adjacency structure, reusing the cached copy when the
+    database has not changed since it was loaded
+
+    Returns:
+        Dict mapping each entity id to the list of its direct prerequisites
+    """
+    version = get_data_version(db_path)
+    cached = _graph_cache.get(db_path)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    graph = {}
+    placeholders = ", ".join("?" for _ in PREREQUISITE_RELATIONSHIPS)
+    conn = get_connection(db_path)
+    try:
+        cursor = conn.execute(
+            f"SELECT subject_id, object_id, relationship FROM relationships WHERE relationship IN ({placeholders})",
+            list(PREREQUISITE_RELATIONSHIPS)
+        )
+        for subject_id, object_id, relationship in cursor:
+            if PREREQUISITE_RELATIONSHIPS[relationship]:
+                before, after = subject_id, object_id
+            else:
+                before, after = object_id, subject_id
+            graph.setdefault(after, []).append(before)
+    finally:
+        conn.close()
+
+    _graph_cache[db_path] = (version, graph)
+    return graph
+
+def _strongly_connected_components(graph, roots):
+    """
+    Iterative Tarjan's algorithm over the nodes reachable from roots
+
+    Components are returned in an order where every component comes after all
+    components it has edges to, i.e. prerequisites first.
+    """
+    index_of = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+
+    for root in roots:
+        if root in index_of:
+            continue
+        work = [(root, iter(graph.get(root, ())))]
+        index_of[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index_of:
+                    index_of[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(graph.get(child, ()))))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index_of[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+def plan_learning_path(target_ids, db_path='math.db'):
+    """
+    Plan the order in which to learn one or more target entities
+
+    The plan contains exactly the targets and their transitive prerequisites,
+    ordered so that every entity comes after everything it depends on.
+
+    Args:
+        target_ids: Entity id or list of entity ids to plan for
+        db_path: Path to the database
+
+    Returns:
+        Dict with:
+            order: list of (entity_id, level) tuples, prerequisites first; level is
+                the length of the longest prerequisite chain below the entity
+            cycles: list of entity id lists that depend on each other circularly
+    """
+    if isinstance(target_ids, int):
+        target_ids = [target_ids]
+    graph = load_prerequisite_graph(db_path)
+    components = _strongly_connected_components(graph, [int(t) for t in target_ids])
+
+    order = []
+    cycles = []
+    level_of = {}
+    for component in components:
+        members = set(component)
+        if len(component) > 1 or component[0] in graph.get(component[0], ()):
+            cycles.append(sorted(component))
+        level = 0
+        for member in component:
+            for prerequisite in graph.get(member, ()):
+                if prerequisite not in members:
+                    level = max(level, level_of[prerequisite] + 1)
+        for member in sorted(component):
+            level_of[member] = level
+            order.append((member, level))
+    # Group by level; every prerequisite outside a cycle has a strictly lower level
+    order.sort(key=lambda item: item[1])
+    return {'order': order, 'cycles': cycles}
+
+def get_plan_details(plan, target_ids, db_path='math.db'):
+    """Join a learning plan with entity names, types and courses"""
+    if not plan['order']:
+        return pd.DataFrame()
+    ids = [entity_id for entity_id, _ in plan['order']]
+    query = """
+    SELECT id, name, type, course
+    FROM math_entities
+    WHERE id IN (SELECT value FROM json_each(?))
+    """
+    entities = execute_query(query, params=(json.dumps(ids),), db_path=db_path).set_index('id')
+    targets = set(int(t) for t in target_ids)
+    rows = []
+    for position, (entity_id, level) in enumerate(plan['order'], start=1):
+        entity = entities.loc[entity_id] if entity_id in entities.index else None
+        rows.append({
+            'Step': position,
+            'Level': level,
+            'ID': entity_id,
+            'Name': entity['name'] if entity is not None else None,
+            'Type': entity['type'] if entity is not None else None,
+            'Course': entity['course'] if entity is not None else None,
+            'Target': entity_id in targets,
+        })
+    return pd.DataFrame(rows)
+
+def display_learning_path_page(db_path='math.db'):
+    """
+    Display the learning path planner
+    """
+    st.header("Learning Path Planner")
+    st.markdown("""
+    Pick one or more target entities to get every prerequisite you need to learn first,
+    in order. The plan follows `prerequisite_for` and `derived_from` relationships.
+    """)
+
+    if 'planner_targets' not in st.session_state:
+        st.session_state.planner_targets = []
+
+    # Search for targets to add
+    target_search = st.text_input("Search entity by name:", key="planner_search")
+    if target_search:
+        search_results = execute_query(
+            "SELECT id, name, type FROM math_entities WHERE name LIKE ? ORDER BY name LIMIT 20",
+            params=(f"%{target_search}%",),
+            db_path=db_path
+        )
+        if not search_results.empty:
+            options = [f"{row['id']}: {row['name']} ({row['type']})" for _, row in search_results.iterrows()]
+            selected = st.selectbox("Select entity:", options=options, key="planner_select")
+            if st.button("Add target") and selected not in st.session_state.planner_targets:
+                st.session_state.planner_targets.append(selected)
+        else:
+            st.warning(f"No entities found matching '{target_search}'")
+
+    targets = st.multiselect(
+        "Targets:",
+        options=st.session_state.planner_targets,
+        default=st.session_state.planner_targets
+    )
+    st.session_state.planner_targets = targets
+
+    if not targets:
+        st.info("Add at least one target entity to plan a learning path.")
+        return
+
+    target_ids = [int(target.split(":")[0].strip()) for target in targets]
+    plan = plan_learning_path(target_ids, db_path)
+
+    for cycle in plan['cycles']:
+        st.warning(f"Circular prerequisites between entities {', '.join(str(c) for c in cycle)}; "
+                   "they are listed together at the same level.")
+
+    details = get_plan_details(plan, target_ids, db_path)
+    st.write(f"{len(details)} entities to learn, in {details['Level'].max() + 1} levels.")
+    st.dataframe(details, use_container_width=True, hide_index=True)
@@ -1,3 +1,5 @@
+from tracing import traced
+
 # Query templates for the math database
 
 # Basic table queries
@@ -11,6 +13,19 @@ WHERE 1=1
 ORDER BY id
 """
 
+# Entity listing ordered by precomputed importance (PageRank)
+MATH_ENTITIES_RANKED_QUERY = """
+SELECT math_entities.*, ROUND(entity_scores.pagerank * 1000000, 2) as importance
+FROM math_entities
+LEFT JOIN entity_scores ON entity_scores.entity_id = math_entities.id
+WHERE 1=1
+{type_filter}
+{course_filter}
+{name_filter}
+{parent_filter}
+ORDER BY IFNULL(entity_scores.pagerank, 0) DESC, math_entities.id
+"""
+
 RELATIONSHIPS_QUERY = """
 SELECT 
     r.id,
@@ -116,19 +131,25 @@ def build_entity_filter(entity_value):
     return ""
 
 # Function to build complete queries
-def get_filtered_entities_query(type_value=None, course_value=None, name_value=None, parent_value=None):
+@traced
+def get_filtered_entities_query(type_value=None, course_value=None, name_value=None, parent_value=None,
+                                order_by_importance=False):
     type_filter = build_type_filter(type_value)
     course_filter = build_course_filter(course_value)
     name_filter = build_name_filter(name_value)
     parent_filter = build_parent_filter(parent_value)
     
-    return MATH_ENTITIES_QUERY.format(
+    # Ranking requires the entity_scores table built by centrality.py
+    template = MATH_ENTITIES_RANKED_QUERY if order_by_importance else MATH_ENTITIES_QUERY
+    
+    return template.format(
         type_filter=type_filter,
         course_filter=course_filter,
         name_filter=name_filter,
         parent_filter=parent_filter
     )
 
+@traced
 def get_filtered_relationships_query(relationship_value=None, subject_value=None, object_value=None):
     relationship_filter = build_relationship_filter(relationship_value)
     subject_filter = build_subject_filter(subject_value)
@@ -140,6 +161,7 @@ def get_filtered_relationships_query(relationship_value=None, subject_value=None
         object_filter=object_filter
     )
 
+@traced
 def get_filtered_tags_query(tag_value=None, entity_value=None):
     tag_filter = build_tag_filter(tag_value)
     entity_filter = build_entity_filter(entity_value)
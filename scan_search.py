@@ -0,0 +1,237 @@
+import os
+import re
+import sys
+import types
+import atexit
+import sqlite3
+import threading
+import functools
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# Search page field names mapped to math_entities columns ("Tags" is handled separately)
+SCAN_FIELDS = {
+    "Names": "name",
+    "Descriptions": "description",
+    "LaTeX Content": "latex_content",
+}
+
+SCAN_RESULT_COLUMNS = ['id', 'name', 'type', 'course', 'match_type', 'matched_field', 'snippet']
+
+# Target number of entity rows scanned by one task
+DEFAULT_CHUNK_ROWS = 20000
+
+# Bytes of the database file each worker maps into memory
+MMAP_SIZE = 1 << 30
+
+# Characters of context shown around a match
+SNIPPET_CONTEXT = 40
+
+# Worker pool shared by all scans of this process
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+# Serialises temporary replacements of sys.modules['__main__']
+_main_lock = threading.Lock()
+
+@contextmanager
+def _detached_main():
+    """
+    Hide the running script from worker processes started in this block
+
+    Streamlit registers the app script as __main__, and spawned workers import the
+    __main__ file again on start-up, which would run the whole app in every worker.
+    A __main__ without a file makes them import only the modules the tasks need.
+    Forking instead is not safe in the multithreaded Streamlit server.
+
+    sys.modules['__main__'] is process-wide and Streamlit replaces it on every rerun
+    of every session. The original module is therefore only put back if nothing
+    replaced the placeholder meanwhile. A worker started while another session's
+    rerun has just replaced it would still import that script, which is why this
+    is only used for the short moment in which the pool starts its workers.
+    """
+    with _main_lock:
+        main_module = sys.modules.get('__main__')
+        placeholder = types.ModuleType('__main__')
+        sys.modules['__main__'] = placeholder
+        try:
+            yield
+        finally:
+            if sys.modules.get('__main__') is placeholder:
+                sys.modules['__main__'] = main_module
+
+def _get_pool(workers=None):
+    """Get the shared process pool, (re)creating it for a different worker count"""
+    global _pool, _pool_workers
+    workers = workers or os.cpu_count() or 1
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            with _detached_main():
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                # The pool spawns a worker per submit while fewer are running; start
+                # them all now so that scans never spawn one later
+                for _ in range(workers):
+                    _pool.submit(os.getpid)
+            _pool_workers = workers
+        return _pool
+
+@atexit.register
+def shutdown_pool():
+    """Stop the worker processes"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def compile_pattern(query, use_regex, case_sensitive):
+    """
+    Compile the search query into a regular expression
+
+    Raises:
+        re.error: If use_regex is set and the query is not a valid regular expression
+    """
+    pattern = query if use_regex else re.escape(query)
+    return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+
+@functools.lru_cache(maxsize=32)
+def _cached_pattern(query, use_regex, case_sensitive):
+    return compile_pattern(query, use_regex, case_sensitive)
+
+def _snippet(text, match):
+    start = max(match.start() - SNIPPET_CONTEXT, 0)
+    end = min(match.end() + SNIPPET_CONTEXT, len(text))
+    return ("..." if start > 0 else "") + text[start:end] + ("..." if end < len(text) else "")
+
+def get_id_ranges(db_path='math.db', chunk_rows=DEFAULT_CHUNK_ROWS, min_chunks=1):
+    """
+    Split the entity id space into contiguous ranges of roughly chunk_rows rows
+
+    Returns:
+        List of inclusive (low_id, high_id) tuples
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        low, high, count = conn.execute(
+            "SELECT MIN(id), MAX(id), COUNT(*) FROM math_entities"
+        ).fetchone()
+    finally:
+        conn.close()
+    if not count:
+        return []
+    chunks = max(min_chunks, -(-count // chunk_rows))
+    step = max(1, -(-(high - low + 1) // chunks))
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+def scan_range(db_path, low_id, high_id, query, use_regex, case_sensitive, fields,
+               entity_types=None, courses=None):
+    """
+    Scan one id range of math_entities for matches; runs in a worker process
+
+    Each call opens its own read-only connection.
+
+    Returns:
+        List of result tuples in SCAN_RESULT_COLUMNS order, at most one per entity
+    """
+    pattern = _cached_pattern(query, use_regex, case_sensitive)
+    columns = [SCAN_FIELDS[field] for field in fields if field in SCAN_FIELDS]
+    select_columns = "".join(f", {column}" for column in columns)
+    sql = f"SELECT id, name, type, course{select_columns} FROM math_entities WHERE id BETWEEN ? AND ?"
+    params = [low_id, high_id]
+    if entity_types:
+        sql += f" AND type IN ({', '.join('?' for _ in entity_types)})"
+        params.extend(entity_types)
+    if courses:
+        sql += f" AND course IN ({', '.join('?' for _ in courses)})"
+        params.extend(courses)
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        # Read pages through a shared memory map instead of copying them into the page cache
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        rows = conn.execute(sql, params).fetchall()
+        tags = {}
+        if "Tags" in fields:
+            for entity_id, tag in conn.execute(
+                "SELECT entity_id, tag FROM tags WHERE entity_id BETWEEN ? AND ?", (low_id, high_id)
+            ):
+                tags.setdefault(entity_id, []).append(tag)
+    finally:
+        conn.close()
+
+    results = []
+    for row in rows:
+        entity_id, name, entity_type, course = row[:4]
+        found = None
+        for column, text in zip(columns, row[4:]):
+            if text:
+                match = pattern.search(text)
+                if match:
+                    found = (entity_id, name, entity_type, course, "Entity Match", column, _snippet(text, match))
+                    break
+        if found is None:
+            for tag in tags.get(entity_id, ()):
+                match = pattern.search(tag)
+                if match:
+                    found = (entity_id, name, entity_type, course, "Tag Match", "tag", tag)
+                    break
+        if found is not None:
+            results.append(found)
+    return results
+
+def iter_scan_search(query, fields, entity_types=None, courses=None, case_sensitive=True,
+                     use_regex=False, db_path='math.db', workers=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Scan all entities in parallel and yield matches as each id range finishes
+
+    Args:
+        query: Substring or regular expression to search for
+        fields: Search page field names to match against ("Names", "Tags", ...)
+        entity_types: Optional list of entity types to include
+        courses: Optional list of courses to include
+        case_sensitive: Whether matching is case sensitive
+        use_regex: Treat the query as a regular expression
+        db_path: Path to the database
+        workers: Number of worker processes; defaults to the CPU count
+        chunk_rows: Target number of rows per scanned range
+
+    Yields:
+        Tuples (results, completed_ranges, total_ranges) where results is the list of
+        matches of one range
+
+    Raises:
+        re.error: If use_regex is set and the query is not a valid regular expression
+    """
+    # Fail fast on invalid patterns before dispatching any work
+    compile_pattern(query, use_regex, case_sensitive)
+    db_path = os.path.abspath(db_path)
+    ranges = get_id_ranges(db_path, chunk_rows, min_chunks=2 * (workers or os.cpu_count() or 1))
+    try:
+        pool = _get_pool(workers)
+        futures = [
+            pool.submit(scan_range, db_path, low, high, query, use_regex, case_sensitive,
+                        list(fields), list(entity_types or []), list(courses or []))
+            for low, high in ranges
+        ]
+    except BrokenProcessPool:
+        shutdown_pool()
+        raise
+    try:
+        for completed, future in enumerate(as_completed(futures), start=1):
+            yield future.result(), completed, len(futures)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next scan
+        shutdown_pool()
+        raise
+    finally:
+        # Stop queued ranges if the caller stops consuming early
+        for future in futures:
+            future.cancel()
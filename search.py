@@ -1,6 +1,25 @@
+import re
+import json
+import threading
+from collections import OrderedDict
 import streamlit as st
 import pandas as pd
 from database import execute_query
+from recommender import get_related_entities
+from centrality import has_entity_scores, get_entity_scores_version
+from change_log import get_data_version
+from tracing import traced
+from scan_search import iter_scan_search, SCAN_RESULT_COLUMNS
+
+# Search result caching and paging policy
+SEARCH_CACHE_SIZE = 128
+MIN_QUERY_LENGTH = 2
+PREFIX_REUSE_MAX_CANDIDATES = 5000
+RESULTS_PAGE_SIZES = [25, 50, 100, 250]
+
+# LRU cache of search results, keyed by search_cache_key()
+_search_cache = OrderedDict()
+_search_cache_lock = threading.Lock()
 
 def display_search_page(db_path='math.db'):
     """
@@ -27,6 +46,9 @@ def display_search_page(db_path='math.db'):
         )
         
         case_sensitive = st.checkbox("Case sensitive", value=False)
+        
+        use_regex = st.checkbox("Regular expression", value=False,
+                                help="Match the search term as a Python regular expression")
     
     with col2:
         entity_types = st.multiselect(
@@ -43,31 +65,66 @@ def display_search_page(db_path='math.db'):
         )
     
     # Execute search
-    if st.button("Search") or search_query:
+    search_clicked = st.button("Search")
+    if search_clicked or search_query:
         if not search_query:
             st.warning("Please enter a search term")
             return
         
-        # Perform search
-        results = perform_search(
-            search_query, 
-            search_in, 
-            entity_types, 
-            courses, 
-            case_sensitive,
-            db_path
-        )
+        if len(normalize_query(search_query, case_sensitive)) < MIN_QUERY_LENGTH:
+            st.info(f"Please enter at least {MIN_QUERY_LENGTH} characters to search")
+            return
+        
+        # Perform search; unrelated widget changes are served from the cache.
+        # Regex and case-sensitive searches cannot use SQL LIKE and run as a parallel scan.
+        if use_regex or case_sensitive:
+            results = cached_scan_search(
+                search_query,
+                search_in,
+                entity_types,
+                courses,
+                case_sensitive,
+                use_regex,
+                db_path
+            )
+            if results is None:
+                return
+        else:
+            try:
+                results = cached_search(
+                    search_query, 
+                    search_in, 
+                    entity_types, 
+                    courses, 
+                    case_sensitive,
+                    db_path
+                )
+            except Exception as e:
+                st.error(f"Error executing search: {str(e)}")
+                return
         
         # Display results
         if not results.empty:
             st.success(f"Found {len(results)} results matching '{search_query}'")
-            st.dataframe(results, use_container_width=True)
+            
+            # Paginate the results
+            col1, col2 = st.columns(2)
+            with col1:
+                page_size = st.selectbox("Results per page:", options=RESULTS_PAGE_SIZES, key="search_page_size")
+            page_count = (len(results) - 1) // page_size + 1
+            with col2:
+                page_number = st.number_input(
+                    f"Page (of {page_count}):", min_value=1, max_value=page_count, value=1, step=1,
+                    key="search_page_number"
+                )
+            page_results = results.iloc[(page_number - 1) * page_size:page_number * page_size]
+            st.dataframe(page_results, use_container_width=True)
             
             # Option to view entity
             if st.checkbox("View entity details", value=False):
                 entity_id = st.selectbox(
                     "Select entity to view:",
-                    options=[f"{row['id']}: {row['name']} ({row['type']})" for _, row in results.iterrows()]
+                    options=[f"{row['id']}: {row['name']} ({row['type']})" for _, row in page_results.iterrows()]
                 )
                 
                 if entity_id:
@@ -82,13 +139,165 @@ def display_search_page(db_path='math.db'):
             # Suggestion for similar terms
             suggest_similar_terms(search_query, db_path)
 
+@traced
 def get_course_list(db_path):
     """Get list of available courses from the database"""
     query = "SELECT DISTINCT course FROM math_entities WHERE course IS NOT NULL ORDER BY course"
     result = execute_query(query, db_path=db_path)
     return result['course'].tolist() if not result.empty else []
 
-def perform_search(query, search_in, entity_types, courses, case_sensitive, db_path):
+def normalize_query(query, case_sensitive):
+    """Normalize a search query by trimming and collapsing whitespace"""
+    query = " ".join(query.split())
+    return query if case_sensitive else query.lower()
+
+def search_cache_key(query, search_in, entity_types, courses, case_sensitive, db_path, version, mode='like'):
+    """Build the cache key of a search; option lists are order-insensitive"""
+    return (
+        db_path,
+        version,
+        normalize_query(query, case_sensitive) if mode == 'like' else query,
+        tuple(sorted(search_in)),
+        tuple(sorted(entity_types)),
+        tuple(sorted(courses)),
+        bool(case_sensitive),
+        mode,
+    )
+
+def _get_cached_results(key):
+    """Look up a cached result and mark it as recently used"""
+    with _search_cache_lock:
+        if key in _search_cache:
+            _search_cache.move_to_end(key)
+            return _search_cache[key]
+    return None
+
+def _store_cached_results(key, results):
+    """Cache a result, evicting the least recently used entries"""
+    with _search_cache_lock:
+        _search_cache[key] = results
+        while len(_search_cache) > SEARCH_CACHE_SIZE:
+            _search_cache.popitem(last=False)
+
+def _find_reusable_result(key):
+    """
+    Find the cached result of the longest query contained in the key's query
+
+    Every match of a LIKE '%query%' search also matches any substring of the query,
+    so such a result is a superset that can be used as the candidate set.
+    """
+    best = None
+    query = key[2]
+    for cached_key, cached_results in _search_cache.items():
+        cached_query = cached_key[2]
+        if (cached_key[:2] == key[:2] and cached_key[3:] == key[3:]
+                and cached_query in query
+                and 'id' in cached_results.columns
+                and len(cached_results) <= PREFIX_REUSE_MAX_CANDIDATES
+                and (best is None or len(cached_query) > len(best[0]))):
+            best = (cached_query, cached_results)
+    return best[1] if best else None
+
+@traced
+def cached_search(query, search_in, entity_types, courses, case_sensitive, db_path):
+    """
+    Run perform_search through a bounded LRU cache
+
+    Results are cached per normalized query, search options, database data
+    version and entity_scores build, so they are invalidated by any change to the
+    database and by a rebuild of the importance ranking. When the query
+    extends a cached one, only the cached result ids are searched again.
+    Failed searches raise and are not cached.
+    """
+    version = (get_data_version(db_path), get_entity_scores_version(db_path))
+    key = search_cache_key(query, search_in, entity_types, courses, case_sensitive, db_path, version)
+    cached = _get_cached_results(key)
+    if cached is not None:
+        return cached
+    with _search_cache_lock:
+        candidates = _find_reusable_result(key)
+    
+    candidate_ids = None
+    if candidates is not None:
+        candidate_ids = sorted(set(int(i) for i in candidates['id']))
+    
+    results = perform_search(
+        normalize_query(query, True), search_in, entity_types, courses, case_sensitive, db_path,
+        candidate_ids=candidate_ids
+    )
+    _store_cached_results(key, results)
+    return results
+
+@traced
+def cached_scan_search(query, search_in, entity_types, courses, case_sensitive, use_regex, db_path):
+    """
+    Run a parallel scan search, streaming hits into the page as they arrive
+
+    Finished scans are cached like LIKE searches. Returns None, after showing the
+    error, when the query is not a valid regular expression or the scan fails.
+    """
+    version = (get_data_version(db_path), get_entity_scores_version(db_path))
+    mode = 'regex' if use_regex else 'substring'
+    key = search_cache_key(query, search_in, entity_types, courses, case_sensitive, db_path, version, mode)
+    cached = _get_cached_results(key)
+    if cached is not None:
+        return cached
+    
+    progress = st.progress(0.0, text="Scanning...")
+    preview = st.empty()
+    matches = []
+    try:
+        for chunk, completed, total in iter_scan_search(
+            query, search_in, entity_types, courses, case_sensitive, use_regex, db_path
+        ):
+            matches.extend(chunk)
+            progress.progress(completed / total, text=f"Scanned {completed} of {total} ranges, {len(matches)} hits")
+            if chunk:
+                preview.dataframe(
+                    pd.DataFrame(matches[:RESULTS_PAGE_SIZES[0]], columns=SCAN_RESULT_COLUMNS),
+                    use_container_width=True
+                )
+        results = rank_scan_results(pd.DataFrame(matches, columns=SCAN_RESULT_COLUMNS), db_path)
+    except re.error as e:
+        st.error(f"Invalid regular expression: {str(e)}")
+        return None
+    except Exception as e:
+        st.error(f"Error executing search: {str(e)}")
+        return None
+    finally:
+        progress.empty()
+        preview.empty()
+    
+    _store_cached_results(key, results)
+    return results
+
+def rank_scan_results(results, db_path, rank_by_importance=True):
+    """
+    Order scan results like perform_search: by PageRank when entity scores exist,
+    otherwise by name
+    """
+    if not (rank_by_importance and has_entity_scores(db_path)) or results.empty:
+        return results.sort_values(['name', 'id'], kind='mergesort', ignore_index=True)
+    ids = json.dumps([int(i) for i in results['id']])
+    scores = execute_query(f"""
+    SELECT entity_id as id, pagerank, ROUND(pagerank * 1000000, 2) as importance
+    FROM entity_scores
+    WHERE entity_id IN (SELECT value FROM json_each('{ids}'))
+    """, db_path=db_path)
+    results = results.merge(scores, on='id', how='left')
+    results['pagerank'] = results['pagerank'].fillna(0)
+    results = results.sort_values(['pagerank', 'name', 'id'], ascending=[False, True, True],
+                                  kind='mergesort', ignore_index=True)
+    return results.drop(columns=['pagerank'])
+
+def clear_search_cache():
+    """Drop all cached search results"""
+    with _search_cache_lock:
+        _search_cache.clear()
+
+@traced
+def perform_search(query, search_in, entity_types, courses, case_sensitive, db_path, rank_by_importance=True,
+                   candidate_ids=None):
     """
     Execute search across different fields based on user options
     
@@ -99,9 +308,14 @@ def perform_search(query, search_in, entity_types, courses, case_sensitive, db_p
         courses: List of courses to include
         case_sensitive: Whether to do a case-sensitive search
         db_path: Path to the database
+        rank_by_importance: Order results by PageRank when entity scores exist
+        candidate_ids: Optional list of entity ids to restrict the search to
     
     Returns:
         DataFrame with search results
+    
+    Raises:
+        Exception: If the search query fails
     """
     # Prepare the LIKE operation based on case sensitivity
     if case_sensitive:
@@ -143,6 +357,13 @@ def perform_search(query, search_in, entity_types, courses, case_sensitive, db_p
         course_conditions = ", ".join([f"'{c}'" for c in courses])
         course_clause = f"AND e.course IN ({course_conditions})"
     
+    # Restrict to known candidates, e.g. the results of a shorter query
+    candidate_clause = ""
+    if candidate_ids is not None:
+        if not candidate_ids:
+            return pd.DataFrame(columns=['id', 'name', 'type', 'course', 'match_type'])
+        candidate_clause = f"AND e.id IN (SELECT value FROM json_each('{json.dumps([int(i) for i in candidate_ids])}'))"
+    
     # Build the query for entity search (excluding tags)
     entity_search_conditions = " OR ".join(search_clauses) if search_clauses else "1=0"
     entity_query = f"""
@@ -151,6 +372,7 @@ def perform_search(query, search_in, entity_types, courses, case_sensitive, db_p
     WHERE ({entity_search_conditions})
     {type_clause}
     {course_clause}
+    {candidate_clause}
     """
     
     # Build the query for tag search
@@ -164,22 +386,30 @@ def perform_search(query, search_in, entity_types, courses, case_sensitive, db_p
         WHERE {'' if case_sensitive else 'LOWER('}t.tag{'' if case_sensitive else ')'} {like_op} '%{query}%'
         {type_clause}
         {course_clause}
+        {candidate_clause}
         """
     
-    # Combine queries and execute
-    full_query = f"""
-    {entity_query}
-    {tag_query}
-    ORDER BY name
-    """
+    # Combine queries and execute, ranking by importance when scores are available
+    if rank_by_importance and has_entity_scores(db_path):
+        full_query = f"""
+        SELECT res.*, ROUND(s.pagerank * 1000000, 2) as importance
+        FROM (
+            {entity_query}
+            {tag_query}
+        ) res
+        LEFT JOIN entity_scores s ON s.entity_id = res.id
+        ORDER BY IFNULL(s.pagerank, 0) DESC, res.name
+        """
+    else:
+        full_query = f"""
+        {entity_query}
+        {tag_query}
+        ORDER BY name
+        """
     
-    try:
-        results = execute_query(full_query, db_path=db_path)
-        return results
-    except Exception as e:
-        st.error(f"Error executing search: {str(e)}")
-        return pd.DataFrame()
+    return execute_query(full_query, db_path=db_path)
 
+@traced
 def display_entity_details(entity_id, db_path):
     """
     Display detailed information about a selected entity
@@ -264,7 +494,15 @@ def display_entity_details(entity_id, db_path):
         st.markdown("**Related to this entity:**")
         for _, rel in incoming.iterrows():
             st.write(f"- {rel['name']} ({rel['type']}) → {rel['relationship']}")
+    
+    # Precomputed similar entities
+    related = get_related_entities(entity['id'], db_path)
+    if not related.empty:
+        st.markdown("**Similar entities:**")
+        for _, rel in related.iterrows():
+            st.write(f"- {rel['name']} ({rel['type']}, similarity {rel['similarity']})")
 
+@traced
 def suggest_similar_terms(query, db_path):
     """
     Suggest similar terms when no results are found
@@ -0,0 +1,421 @@
+import re
+import streamlit as st
+from database import get_connection, execute_query, execute_script_write
+
+# Summary tables holding precomputed counts. NULL types/courses are stored as ''
+# so that they can take part in the primary key.
+SUMMARY_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS stats_entity_counts (
+    type TEXT NOT NULL,
+    course TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (type, course)
+);
+CREATE TABLE IF NOT EXISTS stats_relationship_counts (
+    relationship TEXT NOT NULL PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS stats_tag_counts (
+    tag TEXT NOT NULL PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS stats_parent_fanout (
+    parent_id INTEGER NOT NULL PRIMARY KEY,
+    child_count INTEGER NOT NULL DEFAULT 0
+);
+-- The entity triggers look up an entity's relationships and tags on every change
+CREATE INDEX IF NOT EXISTS idx_relationships_subject ON relationships (subject_id);
+CREATE INDEX IF NOT EXISTS idx_relationships_object ON relationships (object_id);
+CREATE INDEX IF NOT EXISTS idx_tags_entity ON tags (entity_id);
+"""
+
+# Triggers keeping the summary tables up to date on every insert, update and delete.
+# Relationship and tag counts follow the joins of the Relationships and Tags tabs:
+# a relationship is only counted while both of its entities exist, a tag only
+# while its entity exists.
+SUMMARY_TRIGGERS_SQL = """
+CREATE TRIGGER IF NOT EXISTS stats_entities_insert AFTER INSERT ON math_entities
+BEGIN
+    INSERT INTO stats_entity_counts (type, course, count)
+    VALUES (IFNULL(NEW.type, ''), IFNULL(NEW.course, ''), 1)
+    ON CONFLICT (type, course) DO UPDATE SET count = count + 1;
+    INSERT INTO stats_parent_fanout (parent_id, child_count)
+    SELECT NEW.parent_id, 1 WHERE NEW.parent_id IS NOT NULL
+    ON CONFLICT (parent_id) DO UPDATE SET child_count = child_count + 1;
+    INSERT INTO stats_relationship_counts (relationship, count)
+    SELECT IFNULL(r.relationship, ''), COUNT(*)
+    FROM relationships r
+    WHERE (r.subject_id = NEW.id OR r.object_id = NEW.id)
+      AND EXISTS (SELECT 1 FROM math_entities WHERE id = r.subject_id)
+      AND EXISTS (SELECT 1 FROM math_entities WHERE id = r.object_id)
+    GROUP BY IFNULL(r.relationship, '')
+    ON CONFLICT (relationship) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO stats_tag_counts (tag, count)
+    SELECT IFNULL(tag, ''), COUNT(*)
+    FROM tags
+    WHERE entity_id = NEW.id
+    GROUP BY IFNULL(tag, '')
+    ON CONFLICT (tag) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_entities_delete AFTER DELETE ON math_entities
+BEGIN
+    UPDATE stats_entity_counts SET count = count - 1
+    WHERE type = IFNULL(OLD.type, '') AND course = IFNULL(OLD.course, '');
+    DELETE FROM stats_entity_counts
+    WHERE type = IFNULL(OLD.type, '') AND course = IFNULL(OLD.course, '') AND count <= 0;
+    UPDATE stats_parent_fanout SET child_count = child_count - 1
+    WHERE parent_id = OLD.parent_id;
+    DELETE FROM stats_parent_fanout
+    WHERE parent_id = OLD.parent_id AND child_count <= 0;
+    UPDATE stats_relationship_counts SET count = count - (
+        SELECT COUNT(*) FROM relationships r
+        WHERE IFNULL(r.relationship, '') = stats_relationship_counts.relationship
+          AND (r.subject_id = OLD.id OR r.object_id = OLD.id)
+          AND (r.subject_id = OLD.id OR EXISTS (SELECT 1 FROM math_entities WHERE id = r.subject_id))
+          AND (r.object_id = OLD.id OR EXISTS (SELECT 1 FROM math_entities WHERE id = r.object_id))
+    )
+    WHERE relationship IN (
+        SELECT IFNULL(relationship, '') FROM relationships WHERE subject_id = OLD.id OR object_id = OLD.id
+    );
+    DELETE FROM stats_relationship_counts WHERE count <= 0;
+    UPDATE stats_tag_counts SET count = count - (
+        SELECT COUNT(*) FROM tags
+        WHERE entity_id = OLD.id AND IFNULL(tag, '') = stats_tag_counts.tag
+    )
+    WHERE tag IN (SELECT IFNULL(tag, '') FROM tags WHERE entity_id = OLD.id);
+    DELETE FROM stats_tag_counts WHERE count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_entities_update
+AFTER UPDATE OF type, course, parent_id ON math_entities
+BEGIN
+    UPDATE stats_entity_counts SET count = count - 1
+    WHERE type = IFNULL(OLD.type, '') AND course = IFNULL(OLD.course, '');
+    DELETE FROM stats_entity_counts
+    WHERE type = IFNULL(OLD.type, '') AND course = IFNULL(OLD.course, '') AND count <= 0;
+    INSERT INTO stats_entity_counts (type, course, count)
+    VALUES (IFNULL(NEW.type, ''), IFNULL(NEW.course, ''), 1)
+    ON CONFLICT (type, course) DO UPDATE SET count = count + 1;
+    UPDATE stats_parent_fanout SET child_count = child_count - 1
+    WHERE parent_id = OLD.parent_id;
+    DELETE FROM stats_parent_fanout
+    WHERE parent_id = OLD.parent_id AND child_count <= 0;
+    INSERT INTO stats_parent_fanout (parent_id, child_count)
+    SELECT NEW.parent_id, 1 WHERE NEW.parent_id IS NOT NULL
+    ON CONFLICT (parent_id) DO UPDATE SET child_count = child_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_entities_renumber
+AFTER UPDATE OF id ON math_entities
+WHEN OLD.id IS NOT NEW.id
+BEGIN
+    UPDATE stats_relationship_counts SET count = count - (
+        SELECT COUNT(*) FROM relationships r
+        WHERE IFNULL(r.relationship, '') = stats_relationship_counts.relationship
+          AND (r.subject_id = OLD.id OR r.object_id = OLD.id)
+          AND (r.subject_id = OLD.id OR (r.subject_id IS NOT NEW.id
+               AND EXISTS (SELECT 1 FROM math_entities WHERE id = r.subject_id)))
+          AND (r.object_id = OLD.id OR (r.object_id IS NOT NEW.id
+               AND EXISTS (SELECT 1 FROM math_entities WHERE id = r.object_id)))
+    )
+    WHERE relationship IN (
+        SELECT IFNULL(relationship, '') FROM relationships WHERE subject_id = OLD.id OR object_id = OLD.id
+    );
+    DELETE FROM stats_relationship_counts WHERE count <= 0;
+    INSERT INTO stats_relationship_counts (relationship, count)
+    SELECT IFNULL(r.relationship, ''), COUNT(*)
+    FROM relationships r
+    WHERE (r.subject_id = NEW.id OR r.object_id = NEW.id)
+      AND EXISTS (SELECT 1 FROM math_entities WHERE id = r.subject_id)
+      AND EXISTS (SELECT 1 FROM math_entities WHERE id = r.object_id)
+    GROUP BY IFNULL(r.relationship, '')
+    ON CONFLICT (relationship) DO UPDATE SET count = count + excluded.count;
+    UPDATE stats_tag_counts SET count = count - (
+        SELECT COUNT(*) FROM tags
+        WHERE entity_id = OLD.id AND IFNULL(tag, '') = stats_tag_counts.tag
+    )
+    WHERE tag IN (SELECT IFNULL(tag, '') FROM tags WHERE entity_id = OLD.id);
+    DELETE FROM stats_tag_counts WHERE count <= 0;
+    INSERT INTO stats_tag_counts (tag, count)
+    SELECT IFNULL(tag, ''), COUNT(*)
+    FROM tags
+    WHERE entity_id = NEW.id
+    GROUP BY IFNULL(tag, '')
+    ON CONFLICT (tag) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_relationships_insert AFTER INSERT ON relationships
+WHEN EXISTS (SELECT 1 FROM math_entities WHERE id = NEW.subject_id)
+ AND EXISTS (SELECT 1 FROM math_entities WHERE id = NEW.object_id)
+BEGIN
+    INSERT INTO stats_relationship_counts (relationship, count)
+    VALUES (IFNULL(NEW.relationship, ''), 1)
+    ON CONFLICT (relationship) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_relationships_delete AFTER DELETE ON relationships
+WHEN EXISTS (SELECT 1 FROM math_entities WHERE id = OLD.subject_id)
+ AND EXISTS (SELECT 1 FROM math_entities WHERE id = OLD.object_id)
+BEGIN
+    UPDATE stats_relationship_counts SET count = count - 1
+    WHERE relationship = IFNULL(OLD.relationship, '');
+    DELETE FROM stats_relationship_counts
+    WHERE relationship = IFNULL(OLD.relationship, '') AND count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_relationships_update
+AFTER UPDATE OF relationship, subject_id, object_id ON relationships
+BEGIN
+    UPDATE stats_relationship_counts SET count = count - 1
+    WHERE relationship = IFNULL(OLD.relationship, '')
+      AND EXISTS (SELECT 1 FROM math_entities WHERE id = OLD.subject_id)
+      AND EXISTS (SELECT 1 FROM math_entities WHERE id = OLD.object_id);
+    DELETE FROM stats_relationship_counts
+    WHERE relationship = IFNULL(OLD.relationship, '') AND count <= 0;
+    INSERT INTO stats_relationship_counts (relationship, count)
+    SELECT IFNULL(NEW.relationship, ''), 1
+    WHERE EXISTS (SELECT 1 FROM math_entities WHERE id = NEW.subject_id)
+      AND EXISTS (SELECT 1 FROM math_entities WHERE id = NEW.object_id)
+    ON CONFLICT (relationship) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_tags_insert AFTER INSERT ON tags
+WHEN EXISTS (SELECT 1 FROM math_entities WHERE id = NEW.entity_id)
+BEGIN
+    INSERT INTO stats_tag_counts (tag, count)
+    VALUES (IFNULL(NEW.tag, ''), 1)
+    ON CONFLICT (tag) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_tags_delete AFTER DELETE ON tags
+WHEN EXISTS (SELECT 1 FROM math_entities WHERE id = OLD.entity_id)
+BEGIN
+    UPDATE stats_tag_counts SET count = count - 1
+    WHERE tag = IFNULL(OLD.tag, '');
+    DELETE FROM stats_tag_counts
+    WHERE tag = IFNULL(OLD.tag, '') AND count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_tags_update AFTER UPDATE OF tag, entity_id ON tags
+BEGIN
+    UPDATE stats_tag_counts SET count = count - 1
+    WHERE tag = IFNULL(OLD.tag, '')
+      AND EXISTS (SELECT 1 FROM math_entities WHERE id = OLD.entity_id);
+    DELETE FROM stats_tag_counts
+    WHERE tag = IFNULL(OLD.tag, '') AND count <= 0;
+    INSERT INTO stats_tag_counts (tag, count)
+    SELECT IFNULL(NEW.tag, ''), 1
+    WHERE EXISTS (SELECT 1 FROM math_entities WHERE id = NEW.entity_id)
+    ON CONFLICT (tag) DO UPDATE SET count = count + 1;
+END;
+"""
+
+# Names of the triggers above, used to detect databases set up by an older version
+SUMMARY_TRIGGER_NAMES = re.findall(r"CREATE TRIGGER IF NOT EXISTS (\w+)", SUMMARY_TRIGGERS_SQL)
+SUMMARY_INDEX_NAMES = re.findall(r"CREATE INDEX IF NOT EXISTS (\w+)", SUMMARY_TABLES_SQL)
+
+# Full recomputation of the summary tables from the base tables
+REBUILD_SUMMARY_SQL = """
+DELETE FROM stats_entity_counts;
+INSERT INTO stats_entity_counts (type, course, count)
+SELECT IFNULL(type, ''), IFNULL(course, ''), COUNT(*)
+FROM math_entities
+GROUP BY IFNULL(type, ''), IFNULL(course, '');
+
+DELETE FROM stats_relationship_counts;
+INSERT INTO stats_relationship_counts (relationship, count)
+SELECT IFNULL(r.relationship, ''), COUNT(*)
+FROM relationships r
+JOIN math_entities m1 ON r.subject_id = m1.id
+JOIN math_entities m2 ON r.object_id = m2.id
+GROUP BY IFNULL(r.relationship, '');
+
+DELETE FROM stats_tag_counts;
+INSERT INTO stats_tag_counts (tag, count)
+SELECT IFNULL(t.tag, ''), COUNT(*)
+FROM tags t
+JOIN math_entities m ON t.entity_id = m.id
+GROUP BY IFNULL(t.tag, '');
+
+DELETE FROM stats_parent_fanout;
+INSERT INTO stats_parent_fanout (parent_id, child_count)
+SELECT parent_id, COUNT(*)
+FROM math_entities
+WHERE parent_id IS NOT NULL
+GROUP BY parent_id;
+"""
+
+def ensure_summary_tables(db_path='math.db'):
+    """
+    Create the summary tables and their maintenance triggers if needed.
+
+    The tables are filled from the base tables the first time they are created;
+    afterwards the triggers keep them in sync incrementally. Triggers installed by
+    an older version are replaced and the tables rebuilt. Missing indexes used by
+    the triggers are added without a rebuild.
+    """
+    conn = get_connection(db_path)
+    try:
+        installed = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'stats_%'"
+        )}
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'"
+        )}
+    finally:
+        conn.close()
+    if installed == set(SUMMARY_TRIGGER_NAMES):
+        if not set(SUMMARY_INDEX_NAMES) <= indexes:
+            execute_script_write(SUMMARY_TABLES_SQL, db_path)
+        return
+    drop_triggers = "".join(f"DROP TRIGGER IF EXISTS {name};\n" for name in sorted(installed))
+    execute_script_write(
+        drop_triggers + SUMMARY_TABLES_SQL + SUMMARY_TRIGGERS_SQL + REBUILD_SUMMARY_SQL, db_path
+    )
+
+def rebuild_summary_tables(db_path='math.db'):
+    """Recompute all summary tables from scratch"""
+    execute_script_write(REBUILD_SUMMARY_SQL, db_path)
+
+def get_entity_type_course_counts(db_path='math.db'):
+    """Get entity counts for every type and course combination"""
+    query = """
+    SELECT NULLIF(type, '') as type, NULLIF(course, '') as course, count
+    FROM stats_entity_counts
+    ORDER BY type, course
+    """
+    return execute_query(query, db_path=db_path)
+
+def get_relationship_type_counts(db_path='math.db'):
+    """Get the number of relationships of each type"""
+    query = """
+    SELECT NULLIF(relationship, '') as relationship, count
+    FROM stats_relationship_counts
+    ORDER BY count DESC, relationship
+    """
+    return execute_query(query, db_path=db_path)
+
+def get_tag_counts(db_path='math.db'):
+    """Get the number of tag rows with each tag"""
+    query = """
+    SELECT NULLIF(tag, '') as tag, count
+    FROM stats_tag_counts
+    ORDER BY count DESC, tag
+    """
+    return execute_query(query, db_path=db_path)
+
+def get_parent_fanout(limit=None, db_path='math.db'):
+    """Get the number of children for each parent entity, largest first"""
+    query = """
+    SELECT f.parent_id, m.name as parent_name, f.child_count
+    FROM stats_parent_fanout f
+    LEFT JOIN math_entities m ON m.id = f.parent_id
+    ORDER BY f.child_count DESC, f.parent_id
+    """
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    return execute_query(query, db_path=db_path)
+
+def count_entities(type_value=None, course_value=None, db_path='math.db'):
+    """
+    Count entities matching a type and course filter from the summary table
+
+    Args:
+        type_value: Entity type, or None/"All" for any type
+        course_value: Course, or None/"All" for any course
+        db_path: Path to the database
+
+    Returns:
+        Number of matching entities
+    """
+    query = "SELECT IFNULL(SUM(count), 0) as total FROM stats_entity_counts WHERE 1=1"
+    params = []
+    if type_value and type_value != "All":
+        query += " AND type = ?"
+        params.append(type_value)
+    if course_value and course_value != "All":
+        query += " AND course = ?"
+        params.append(course_value)
+    result = execute_query(query, params=params or None, db_path=db_path)
+    return int(result['total'].iloc[0])
+
+def count_relationships(relationship_value=None, db_path='math.db'):
+    """Count relationships of a given type (or all relationships) from the summary table"""
+    query = "SELECT IFNULL(SUM(count), 0) as total FROM stats_relationship_counts"
+    params = None
+    if relationship_value and relationship_value != "All":
+        query += " WHERE relationship = ?"
+        params = (relationship_value,)
+    result = execute_query(query, params=params, db_path=db_path)
+    return int(result['total'].iloc[0])
+
+def count_tags(tag_value=None, db_path='math.db'):
+    """Count tag rows with a given tag (or all tag rows) from the summary table"""
+    query = "SELECT IFNULL(SUM(count), 0) as total FROM stats_tag_counts"
+    params = None
+    if tag_value and tag_value != "All":
+        query += " WHERE tag = ?"
+        params = (tag_value,)
+    result = execute_query(query, params=params, db_path=db_path)
+    return int(result['total'].iloc[0])
+
+def display_stats_page(db_path='math.db'):
+    """
+    Display a dashboard of the precomputed database statistics
+    """
+    st.header("Database Statistics")
+    st.markdown("""
+    Counts below are read from summary tables that are kept up to date by
+    database triggers, so they are available instantly regardless of database size.
+    Relationships and tags are counted while the entities they refer to exist.
+    """)
+
+    type_course_counts = get_entity_type_course_counts(db_path)
+    relationship_counts = get_relationship_type_counts(db_path)
+    tag_counts = get_tag_counts(db_path)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Entities", int(type_course_counts['count'].sum()) if not type_course_counts.empty else 0)
+    col2.metric("Relationships", int(relationship_counts['count'].sum()) if not relationship_counts.empty else 0)
+    col3.metric("Tags", int(tag_counts['count'].sum()) if not tag_counts.empty else 0)
+
+    # Entities per type and course
+    st.subheader("Entities by Type and Course")
+    if not type_course_counts.empty:
+        pivot = type_course_counts.fillna("(none)").pivot_table(
+            index='type', columns='course', values='count', aggfunc='sum', fill_value=0
+        )
+        pivot['Total'] = pivot.sum(axis=1)
+        st.dataframe(pivot, use_container_width=True)
+    else:
+        st.info("No entities in the database.")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Relationships by Type")
+        if not relationship_counts.empty:
+            st.bar_chart(relationship_counts.set_index('relationship')['count'])
+            st.dataframe(relationship_counts, use_container_width=True)
+        else:
+            st.info("No relationships in the database.")
+
+    with col2:
+        st.subheader("Most Used Tags")
+        if not tag_counts.empty:
+            st.bar_chart(tag_counts.head(20).set_index('tag')['count'])
+            st.dataframe(tag_counts, use_container_width=True)
+        else:
+            st.info("No tags in the database.")
+
+    st.subheader("Largest Parent Entities")
+    fanout = get_parent_fanout(limit=20, db_path=db_path)
+    if not fanout.empty:
+        st.dataframe(fanout.rename(columns={
+            'parent_id': 'Parent ID',
+            'parent_name': 'Parent',
+            'child_count': 'Children'
+        }), use_container_width=True)
+    else:
+        st.info("No entities have children.")
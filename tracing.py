@@ -0,0 +1,175 @@
+import io
+import os
+import time
+import json
+import pstats
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+import pandas as pd
+
+# Set to "cprofile" or "pyinstrument" to also profile each traced rerun
+PROFILE_ENV_VAR = "MATH_DB_PROFILE"
+
+# Trace of the rerun running in the current context (each Streamlit session runs
+# its reruns in its own thread, so traces never mix)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+def _now_us():
+    return time.perf_counter_ns() // 1000
+
+# Only one rerun is profiled at a time: cProfile cannot run concurrently on
+# Python 3.12+ ("Another profiling tool is already active")
+_profiler_lock = threading.Lock()
+
+def _start_profiler():
+    """
+    Start the profiler selected by the environment variable, if any
+
+    Returns None, so that the rerun is traced without a profile, when no profiler
+    is selected or available, or when another rerun is being profiled.
+    """
+    mode = os.environ.get(PROFILE_ENV_VAR, "").strip().lower()
+    if mode not in ("cprofile", "pyinstrument") or not _profiler_lock.acquire(blocking=False):
+        return None
+    try:
+        if mode == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+    except (ImportError, ValueError):
+        _profiler_lock.release()
+        return None
+    return mode, profiler
+
+def _stop_profiler(profiler_state):
+    """Stop a profiler and return its report as text"""
+    mode, profiler = profiler_state
+    try:
+        if mode == "cprofile":
+            profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(30)
+            return output.getvalue()
+        profiler.stop()
+        return profiler.output_text(unicode=True)
+    finally:
+        _profiler_lock.release()
+
+def start_trace(name="rerun"):
+    """
+    Start collecting spans for the current rerun
+
+    A trace left unfinished in this context is finished first, so that its
+    profiler never stays active.
+
+    Returns:
+        The trace dict, to be passed to finish_trace()
+    """
+    previous = _current_trace.get()
+    if previous is not None:
+        finish_trace(previous)
+    trace = {
+        'name': name,
+        'start_us': _now_us(),
+        'end_us': None,
+        'events': [],
+        'profile': None,
+        '_profiler': _start_profiler(),
+    }
+    trace['_token'] = _current_trace.set(trace)
+    return trace
+
+def finish_trace(trace):
+    """Stop collecting spans for a trace and stop its profiler"""
+    trace['end_us'] = _now_us()
+    if trace.get('_profiler'):
+        trace['profile'] = _stop_profiler(trace.pop('_profiler'))
+    token = trace.pop('_token', None)
+    if token is not None:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # Finished from a different context than it was started in
+            _current_trace.set(None)
+    return trace
+
+@contextmanager
+def span(name, **args):
+    """Record the duration of a block in the current trace; a no-op when not tracing"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = _now_us()
+    try:
+        yield
+    finally:
+        trace['events'].append({
+            'name': name,
+            'start_us': start,
+            'dur_us': _now_us() - start,
+            'tid': threading.get_ident(),
+            'args': args,
+        })
+
+def traced(func=None, name=None):
+    """Decorator recording every call of a function as a span"""
+    if func is None:
+        return functools.partial(traced, name=name)
+    span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current_trace.get() is None:
+            return func(*args, **kwargs)
+        with span(span_name):
+            return func(*args, **kwargs)
+    return wrapper
+
+def export_chrome_trace(trace):
+    """
+    Convert a trace into Chrome trace event JSON
+
+    The result can be loaded in chrome://tracing or https://ui.perfetto.dev.
+    """
+    events = [{
+        'name': trace['name'],
+        'ph': 'X',
+        'ts': 0,
+        'dur': (trace['end_us'] or _now_us()) - trace['start_us'],
+        'pid': os.getpid(),
+        'tid': 0,
+    }]
+    for event in trace['events']:
+        events.append({
+            'name': event['name'],
+            'ph': 'X',
+            'ts': event['start_us'] - trace['start_us'],
+            'dur': event['dur_us'],
+            'pid': os.getpid(),
+            'tid': event['tid'],
+            'args': {key: str(value) for key, value in event['args'].items()},
+        })
+    return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+def summarize_trace(trace):
+    """
+    Aggregate a trace's spans by name
+
+    Returns:
+        DataFrame with calls, total and max milliseconds per span, slowest first
+    """
+    if not trace['events']:
+        return pd.DataFrame(columns=['span', 'calls', 'total_ms', 'max_ms'])
+    events = pd.DataFrame(trace['events'])
+    summary = events.groupby('name')['dur_us'].agg(['count', 'sum', 'max']).reset_index()
+    summary.columns = ['span', 'calls', 'total_ms', 'max_ms']
+    summary['total_ms'] = (summary['total_ms'] / 1000).round(2)
+    summary['max_ms'] = (summary['max_ms'] / 1000).round(2)
+    return summary.sort_values('total_ms', ascending=False, ignore_index=True)
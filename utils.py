@@ -1,7 +1,9 @@
 import pandas as pd
 from database import get_distinct_values, execute_query
+from tracing import traced
 
 # Get all entity names for the name filter dropdown
+@traced
 def get_name_options(db_path='math.db'):
     """Get a list of entity names for the name filter"""
     query = "SELECT DISTINCT name FROM math_entities ORDER BY name"
@@ -9,6 +11,7 @@ def get_name_options(db_path='math.db'):
     names = result['name'].tolist() if not result.empty else []
     return ["All"] + names
 
+@traced
 def get_entity_name_by_id(entity_id, db_path='math.db'):
     """Get the name of an entity by its ID"""
     if not entity_id:
@@ -19,6 +22,7 @@ def get_entity_name_by_id(entity_id, db_path='math.db'):
         return result['name'].iloc[0]
     return None
 
+@traced
 def get_entity_id_by_name(entity_name, db_path='math.db'):
     """Get the ID of an entity by its name"""
     if not entity_name:
@@ -29,30 +33,35 @@ def get_entity_id_by_name(entity_name, db_path='math.db'):
         return result['id'].iloc[0]
     return None
 
+@traced
 def get_course_options(db_path='math.db'):
     """Get a list of all courses in the database"""
     courses = get_distinct_values('math_entities', 'course', db_path)
     # Add "All" option at the beginning
     return ["All"] + courses
 
+@traced
 def get_type_options(db_path='math.db'):
     """Get a list of all entity types in the database"""
     types = get_distinct_values('math_entities', 'type', db_path)
     # Add "All" option at the beginning
     return ["All"] + types
 
+@traced
 def get_relationship_options(db_path='math.db'):
     """Get a list of all relationship types in the database"""
     relationships = get_distinct_values('relationships', 'relationship', db_path)
     # Add "All" option at the beginning
     return ["All"] + relationships
 
+@traced
 def get_tag_options(db_path='math.db'):
     """Get a list of all tags in the database"""
     tags = get_distinct_values('tags', 'tag', db_path)
     # Add "All" option at the beginning
     return ["All"] + tags
 
+@traced
 def get_parent_options(db_path='math.db'):
     """Get parent options for filtering"""
     query = """
@@ -68,6 +77,7 @@ def get_parent_options(db_path='math.db'):
         options.extend(parent_options)
     return options
 
+@traced
 def format_dataframe_for_display(df, table_name, db_path='math.db'):
     """Format a dataframe for display in Streamlit"""
     if df.empty: